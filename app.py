@@ -2,17 +2,25 @@ from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_restx import Api, Resource, fields
 from flask_cors import CORS
 from dotenv import load_dotenv
+import atexit
 import json
+import logging
 import os
 import threading
 import asyncio
-from queue import Queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import Empty, Queue, SimpleQueue
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load environment variables first
 load_dotenv()
 
 # Import workflow after loading environment variables
-from workflow import Workflow
+from workflow import get_workflow
 from workflow.streaming_handler import get_streaming_handler
 
 app = Flask(__name__)
@@ -28,13 +36,77 @@ api = Api(
     prefix='/api/v1'
 )
 
+# Background thread writing log records; started by configure_logging()
+_log_listener = None
+
+
+def sse_event(payload):
+    """Encode a payload as one SSE data line.
+
+    Stream chunks carry raw text; JSON escaping happens once here, for the
+    whole envelope, using orjson when it is installed.
+    """
+    if orjson is not None:
+        return f"data: {orjson.dumps(payload).decode()}\n\n"
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def drain_batches(queue):
+    """Yield the chunks of a streaming queue in batches, until its None sentinel.
+
+    Blocks for one chunk, then takes every chunk already queued behind it, so
+    a burst of tokens goes out as one write instead of one write per token.
+    """
+    while True:
+        chunk = queue.get()
+        batch = []
+        while chunk is not None:
+            batch.append(chunk)
+            try:
+                chunk = queue.get_nowait()
+            except Empty:
+                break
+        if batch:
+            yield batch
+        if chunk is None:
+            return
+
+
+def configure_logging():
+    """Route the application's log records to stderr, and to LOG_FILE if set.
+
+    Called from the entry point rather than on import, so importing the app
+    (tests, WSGI servers that configure logging themselves) has no side effects.
+    Handlers run on a QueueListener thread, so logging from request threads or
+    the streaming event loop is a non-blocking enqueue instead of a write.
+    Set LOG_LEVEL to change the threshold (default INFO).
+    """
+    global _log_listener
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    handlers = [logging.StreamHandler()]
+    log_file = os.getenv("LOG_FILE")
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=3))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root_logger.addHandler(QueueHandler(log_queue))
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    # Flush queued records on shutdown
+    atexit.register(_log_listener.stop)
+
+
 # Get LLM configuration from environment variables or use defaults
 llm_provider = os.getenv("LLM_PROVIDER", "openai")  # Default to OpenAI
 llm_model = os.getenv("LLM_MODEL", "gpt-4o")  # Default to GPT-4o
 llm_temperature = float(os.getenv("LLM_TEMPERATURE", "0.7"))  # Default temperature
 
 # Initialize the workflow with the configured LLM
-workflow = Workflow(
+workflow = get_workflow(
     provider=llm_provider,
     model_name=llm_model,
     temperature=llm_temperature
@@ -146,14 +218,14 @@ class StreamChat(Resource):
                         # Add the mode to the chunk
                         chunk['stream_mode'] = mode
                         # Yield the chunk as a JSON string with a data: prefix for SSE
-                        yield f"data: {json.dumps(chunk)}\n\n"
+                        yield sse_event(chunk)
                 except Exception as e:
                     error_chunk = {
                         'type': 'error',
                         'content': str(e),
                         'stream_mode': 'error'
                     }
-                    yield f"data: {json.dumps(error_chunk)}\n\n"
+                    yield sse_event(error_chunk)
             
             # Return a streaming response
             return Response(
@@ -205,10 +277,6 @@ class AsyncStreamChat(Resource):
                 stream_mode = stream_mode_param
             
             # Create a queue for async streaming
-            from queue import Queue
-            import threading
-            import asyncio
-            
             queue = Queue()
             
             # Define the async workflow runner
@@ -251,11 +319,8 @@ class AsyncStreamChat(Resource):
             
             # Define the synchronous generator function for streaming
             def generate():
-                while True:
-                    chunk = queue.get()
-                    if chunk is None:
-                        break
-                    yield f"data: {json.dumps(chunk)}\n\n"
+                for batch in drain_batches(queue):
+                    yield "".join([sse_event(chunk) for chunk in batch])
             
             # Return a streaming response
             return Response(
@@ -297,13 +362,13 @@ class StreamTokens(Resource):
                 try:
                     for mode, chunk in workflow.stream(user_input, stream_mode="messages"):
                         if chunk.get('type') == 'token':
-                            yield f"data: {json.dumps({'text': chunk.get('content', '')})}\n\n"
+                            yield sse_event({'text': chunk.get('content', '')})
                 except Exception as e:
                     error_chunk = {
                         'type': 'error',
                         'content': str(e)
                     }
-                    yield f"data: {json.dumps(error_chunk)}\n\n"
+                    yield sse_event(error_chunk)
             
             # Return a streaming response
             return Response(
@@ -351,31 +416,34 @@ class StreamTokenByToken(Resource):
                 asyncio.set_event_loop(loop)
                 
                 try:
-                    # Create the workflow
-                    wf = Workflow()
-                    
-                    # Create the streaming handler with agent reference
-                    stream_handler = get_streaming_handler(wf.agent)
+                    # Create the streaming handler with agent reference. The process-wide
+                    # workflow is reused: a new Workflow per request would rebuild the
+                    # agent and start from an empty conversation history
+                    stream_handler = get_streaming_handler(workflow.agent)
                     
                     # Define the async function to run
                     async def run():
                         # Start the streaming task
                         stream_task = asyncio.create_task(process_stream(stream_handler))
                         
-                        # Run the agent with the streaming handler
-                        final_result = await wf.astream_tokens(user_input, callbacks=[stream_handler])
+                        try:
+                            # Run the agent with the streaming handler
+                            final_result = await workflow.astream_tokens(user_input, callbacks=[stream_handler])
+                        finally:
+                            # Forward the tokens still buffered before the final answer (or
+                            # the error), and let the stream task finish even on failure
+                            stream_handler.close()
+                            await stream_task
                         
                         # Signal that we're done and add the final answer
                         queue.put({"type": "final", "content": final_result.get("output", "")})
                         queue.put(None)  # Signal that we're done
-                        
-                        # Wait for the streaming to complete
-                        await stream_task
                     
                     # Process the stream and put chunks into the queue
                     async def process_stream(handler):
-                        async for chunk in handler.aiter():
-                            queue.put(chunk)
+                        async for batch in handler.abatches():
+                            for chunk in batch:
+                                queue.put(chunk)
                     
                     # Run the async function
                     loop.run_until_complete(run())
@@ -391,41 +459,27 @@ class StreamTokenByToken(Resource):
             
             # Define the generator function for streaming
             def generate():
-                # Track the current section for formatting
-                current_section = "thinking"
-                
-                while True:
-                    chunk = queue.get()
-                    if chunk is None:
-                        break
-                    
-                    if chunk["type"] == "thinking":
-                        # Send thinking tokens individually
-                        event_data = {"event": "message", "data": chunk['content']}
-                        yield f"data: {json.dumps(event_data)}\n\n"
-                    elif chunk["type"] == "token":
-                        # Send response tokens individually
-                        event_data = {"event": "message", "data": chunk['content']}
-                        yield f"data: {json.dumps(event_data)}\n\n"
-                    elif chunk["type"] == "tool_separator":
-                        # Send tool separator
-                        event_data = {"event": "message", "data": chunk['content']}
-                        yield f"data: {json.dumps(event_data)}\n\n"
-                    elif chunk["type"] == "error":
-                        event_data = {"event": "error", "data": chunk['content']}
-                        yield f"data: {json.dumps(event_data)}\n\n"
-                    elif chunk["type"] == "final":
-                        # Send a final answer marker
-                        event_data = {"event": "message", "data": f"\n\n✅ Final Answer: {chunk['content']}"}
-                        yield f"data: {json.dumps(event_data)}\n\n"
-                    elif chunk["type"] == "structured_output":
-                        # Send the initial structured output
-                        event_data = {"event": "structured_output", "data": chunk["content"]}
-                        yield f"data: {json.dumps(event_data)}\n\n"
-                    elif chunk["type"] == "structured_update":
-                        # Send structured updates as they come in
-                        event_data = {"event": "structured_update", "data": chunk["content"]}
-                        yield f"data: {json.dumps(event_data)}\n\n"
+                for batch in drain_batches(queue):
+                    events = []
+                    for chunk in batch:
+                        chunk_type = chunk["type"]
+                        if chunk_type in ("thinking", "token", "tool_separator"):
+                            # Thinking tokens, response tokens and tool separators are
+                            # sent as they arrive
+                            event_data = {"event": "message", "data": chunk['content']}
+                        elif chunk_type == "error":
+                            event_data = {"event": "error", "data": chunk['content']}
+                        elif chunk_type == "final":
+                            # Send a final answer marker
+                            event_data = {"event": "message", "data": f"\n\n✅ Final Answer: {chunk['content']}"}
+                        elif chunk_type in ("structured_output", "structured_update"):
+                            # The structured output and its updates as they come in
+                            event_data = {"event": chunk_type, "data": chunk["content"]}
+                        else:
+                            continue
+                        events.append(sse_event(event_data))
+                    if events:
+                        yield "".join(events)
                 
             # Return a streaming response
             return Response(
@@ -504,5 +558,7 @@ if __name__ == '__main__':
     parser.add_argument('--port', type=int, default=5000, help='Port to run the server on')
     args = parser.parse_args()
     
+    configure_logging()
+    
     # Run the app on the specified port and bind to all interfaces
     app.run(debug=True, host='0.0.0.0', port=args.port)
\ No newline at end of file
@@ -7,12 +7,38 @@ This script checks if all Docker files are properly configured.
 import os
 import sys
 import yaml
-import json
 from pathlib import Path
 
+# Directories whose entries are snapshotted once by build_file_index()
+INDEXED_DIRS = ('.', 'frontend')
+# Parent directories whose entries are covered by FILE_INDEX ('' is the cwd)
+_INDEXED_PARENTS = frozenset(('', *INDEXED_DIRS))
+
+# Snapshot of relative paths found in INDEXED_DIRS, populated by main()
+FILE_INDEX = None
+
+def build_file_index(directories=INDEXED_DIRS):
+    """Scan each directory once and return the set of relative file paths."""
+    index = set()
+    for directory in directories:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    index.add(os.path.normpath(os.path.join(directory, entry.name)))
+        except OSError:
+            continue
+    return index
+
+def file_exists(file_path):
+    """Look a path up in the snapshot, probing the filesystem only for unindexed paths."""
+    if FILE_INDEX is not None and os.path.dirname(os.path.normpath(file_path)) in _INDEXED_PARENTS:
+        return os.path.normpath(file_path) in FILE_INDEX
+    # access(F_OK) is a cheaper existence probe than the stat() behind os.path.exists
+    return os.access(file_path, os.F_OK)
+
 def check_file_exists(file_path, description):
     """Check if a file exists and return status."""
-    if os.path.exists(file_path):
+    if file_exists(file_path):
         print(f"✅ {description}: {file_path}")
         return True
     else:
@@ -27,16 +53,17 @@ def check_dockerfile(dockerfile_path, service_name):
         return False
     
     try:
-        with open(dockerfile_path, 'r') as f:
+        # Keywords are ASCII, so match on raw bytes and skip decoding the file
+        with open(dockerfile_path, 'rb') as f:
             content = f.read()
         
         # Check for required elements
         checks = {
-            'FROM': 'Base image specified',
-            'WORKDIR': 'Working directory set',
-            'COPY': 'Files copied',
-            'EXPOSE': 'Port exposed',
-            'CMD': 'Start command defined'
+            b'FROM': 'Base image specified',
+            b'WORKDIR': 'Working directory set',
+            b'COPY': 'Files copied',
+            b'EXPOSE': 'Port exposed',
+            b'CMD': 'Start command defined'
         }
         
         for keyword, description in checks.items():
@@ -52,6 +79,9 @@ def check_dockerfile(dockerfile_path, service_name):
         print(f"  ❌ Error reading Dockerfile: {e}")
         return False
 
+# Keys every docker-compose service is expected to configure
+SERVICE_KEYS = frozenset({'build', 'ports', 'environment'})
+
 def check_docker_compose():
     """Check docker-compose.yml configuration."""
     print("\n📋 Checking docker-compose.yml...")
@@ -79,36 +109,38 @@ def check_docker_compose():
         services = compose_config['services']
         required_services = ['backend', 'frontend']
         
+        # Report every missing service at once
+        missing_services = set(required_services) - services.keys()
         for service in required_services:
-            if service in services:
-                print(f"  ✅ {service.capitalize()} service defined")
-                
-                # Check service configuration
-                service_config = services[service]
-                
-                # Check build context
-                if 'build' in service_config:
-                    print(f"    ✅ Build configuration present")
-                else:
-                    print(f"    ❌ Build configuration missing")
-                
-                # Check ports
-                if 'ports' in service_config:
-                    ports = service_config['ports']
-                    print(f"    ✅ Ports mapped: {ports}")
-                else:
-                    print(f"    ❌ Port mapping missing")
-                
-                # Check environment variables
-                if 'environment' in service_config:
-                    env_vars = service_config['environment']
-                    print(f"    ✅ Environment variables: {len(env_vars)} defined")
-                else:
-                    print(f"    ⚠️  No environment variables defined")
-                    
-            else:
+            if service in missing_services:
                 print(f"  ❌ {service.capitalize()} service missing")
-                return False
+        if missing_services:
+            return False
+        
+        for service in required_services:
+            print(f"  ✅ {service.capitalize()} service defined")
+            
+            # Check service configuration
+            service_config = services[service]
+            missing_keys = SERVICE_KEYS - service_config.keys()
+            
+            # Check build context
+            if 'build' in missing_keys:
+                print(f"    ❌ Build configuration missing")
+            else:
+                print(f"    ✅ Build configuration present")
+            
+            # Check ports
+            if 'ports' in missing_keys:
+                print(f"    ❌ Port mapping missing")
+            else:
+                print(f"    ✅ Ports mapped: {service_config['ports']}")
+            
+            # Check environment variables
+            if 'environment' in missing_keys:
+                print(f"    ⚠️  No environment variables defined")
+            else:
+                print(f"    ✅ Environment variables: {len(service_config['environment'])} defined")
         
         # Check if frontend depends on backend
         if 'depends_on' in services.get('frontend', {}):
@@ -144,7 +176,7 @@ def check_environment_variables():
     env_documented = False
     
     for env_file in env_files:
-        if os.path.exists(env_file):
+        if file_exists(env_file):
             print(f"  ✅ Environment file found: {env_file}")
             env_documented = True
             break
@@ -179,8 +211,18 @@ def check_package_files():
     
     return backend_ok and frontend_package and frontend_lock
 
+def check_dockerignore_files():
+    """Check .dockerignore files."""
+    print("\n📋 Checking .dockerignore files...")
+    backend_dockerignore = check_file_exists(".dockerignore", "Backend .dockerignore")
+    frontend_dockerignore = check_file_exists("frontend/.dockerignore", "Frontend .dockerignore")
+    
+    return backend_dockerignore and frontend_dockerignore
+
 def main():
     """Main test function."""
+    global FILE_INDEX
+    
     print("🐳 Docker Setup Verification")
     print("=" * 50)
     
@@ -188,35 +230,25 @@ def main():
     project_dir = Path(__file__).parent
     os.chdir(project_dir)
     
-    all_checks_passed = True
-    
-    # Check Dockerfiles
-    backend_dockerfile_ok = check_dockerfile("Dockerfile", "Backend")
-    frontend_dockerfile_ok = check_dockerfile("frontend/Dockerfile", "Frontend")
-    
-    # Check docker-compose
-    compose_ok = check_docker_compose()
+    # Enumerate the project and frontend directories once for all checks
+    FILE_INDEX = build_file_index()
     
-    # Check environment variables
-    env_ok = check_environment_variables()
-    
-    # Check package files
-    packages_ok = check_package_files()
-    
-    # Check .dockerignore files
-    print("\n📋 Checking .dockerignore files...")
-    backend_dockerignore = check_file_exists(".dockerignore", "Backend .dockerignore")
-    frontend_dockerignore = check_file_exists("frontend/.dockerignore", "Frontend .dockerignore")
+    # Ordered cheapest-first; with TRIP_AGENT_FAIL_FAST=1 the remaining checks
+    # (including the docker-compose.yml parse) are skipped after the first failure
+    checks = [
+        lambda: check_dockerfile("Dockerfile", "Backend"),
+        lambda: check_dockerfile("frontend/Dockerfile", "Frontend"),
+        check_package_files,
+        check_environment_variables,
+        check_dockerignore_files,
+        check_docker_compose,
+    ]
     
-    all_checks_passed = (
-        backend_dockerfile_ok and 
-        frontend_dockerfile_ok and 
-        compose_ok and 
-        env_ok and 
-        packages_ok and 
-        backend_dockerignore and 
-        frontend_dockerignore
-    )
+    if os.getenv("TRIP_AGENT_FAIL_FAST") == "1":
+        all_checks_passed = all(check() for check in checks)
+    else:
+        # Run every check so all diagnostics are printed
+        all_checks_passed = all([check() for check in checks])
     
     print("\n" + "=" * 50)
     if all_checks_passed:
@@ -5,8 +5,6 @@ This script simulates frontend behavior when the backend is not running.
 """
 
 import requests
-import json
-from typing import Dict, Any
 
 def test_memory_api_error_handling():
     """
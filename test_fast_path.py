@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the fast-path intent classifier (workflow/fast_path.py).
+Run with: python -m pytest test_fast_path.py
+"""
+
+from workflow.fast_path import classify, usable_observations
+
+
+def test_single_tool_queries():
+    assert classify("What's the weather in Paris?") == (("WeatherTool",), "Paris")
+    assert classify("weather in New York today") == (("WeatherTool",), "New York")
+    assert classify("What time is it in Tokyo?") == (("TimeTool",), "Tokyo")
+
+
+def test_comparisons_go_to_the_agent():
+    assert classify("What time is it in Paris vs London") is None
+    assert classify("What time is it in Paris vs. London?") is None
+    assert classify("weather in Paris and London") is None
+    assert classify("weather in Paris or Rome?") is None
+    assert classify("Is the weather in Paris compared to Rome") is None
+
+
+def test_other_times_go_to_the_agent():
+    assert classify("weather in Paris tomorrow") is None
+    assert classify("What's the weather in London tonight?") is None
+    assert classify("weather in Berlin next week") is None
+    assert classify("weather in Rome on Monday") is None
+
+
+def test_topics_and_references_go_to_the_agent():
+    assert classify("weather in there") is None
+    assert classify("Tell me about the history of Rome") is None
+
+
+def test_utc_fallback_is_a_miss():
+    observations = {"TimeTool": {"city": "Gotham", "timezone": "UTC", "datetime": "2025-01-01 00:00:00",
+                                 "note": "Timezone for Gotham not found. Showing UTC time instead."}}
+    assert usable_observations(observations) == {}
+
+
+def test_errors_are_misses():
+    observations = {
+        "WeatherTool": {"error": "No matching location found."},
+        "TimeTool": {"city": "Paris", "timezone": "Europe/Paris"},
+    }
+    assert usable_observations(observations) == {"TimeTool": {"city": "Paris", "timezone": "Europe/Paris"}}
+
+
+def test_overview_queries():
+    assert classify("Tell me about Paris") == (("CityFactsTool", "WeatherTool", "TimeTool"), "Paris")
+    assert classify("What can you tell me about New York?") == (
+        ("CityFactsTool", "WeatherTool", "TimeTool"), "New York")
+
+
+def test_overview_rejects_pronouns_and_lowercase_topics():
+    assert classify("Tell me about yourself") is None
+    assert classify("Tell me about you") is None
+    assert classify("Tell me about Him") is None
+    assert classify("tell me about them") is None
+    assert classify("What can you tell me about python?") is None
+
+
+def _overview(time, facts):
+    return {"CityFactsTool": facts, "WeatherTool": {"error": "No matching location found."}, "TimeTool": time}
+
+
+def test_overview_needs_a_resolved_place():
+    unknown_time = {"city": "Python", "timezone": "UTC", "note": "Timezone for Python not found."}
+    python_facts = {"title": "Python", "summary": "Python may refer to:", "coordinates": None}
+    assert usable_observations(_overview(unknown_time, python_facts)) == {}
+
+    # A Wikipedia page with coordinates is a place even without a known timezone
+    town_facts = {"title": "Hallstatt", "summary": "Hallstatt is a village", "coordinates": {"lat": 47.56, "lon": 13.65}}
+    assert usable_observations(_overview(unknown_time, town_facts)) == {"CityFactsTool": town_facts}
+
+    paris_time = {"city": "Paris", "timezone": "Europe/Paris"}
+    paris_facts = {"title": "Paris", "summary": "Paris is the capital of France", "coordinates": None}
+    assert usable_observations(_overview(paris_time, paris_facts)) == {
+        "CityFactsTool": paris_facts, "TimeTool": paris_time}
@@ -9,10 +9,11 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from workflow.workflow import Workflow
-import json
 
 def test_memory_functionality():
     """Test the memory functionality with conversation summarization."""
+    import json
+    
     print("Testing Memory Buffer Summary Implementation...")
     print("=" * 50)
     
@@ -30,9 +31,12 @@ def test_memory_functionality():
         result1 = wf.invoke("Hello, my name is David")
         print(f"✅ Response 1: {result1.final_response[:100]}...")
         
-        # Check memory state
+        # Check memory state - each turn must be saved exactly once
         memory_vars = wf.agent.memory.load_memory_variables({})
         print(f"📊 Memory after 1st message: {len(wf.agent.chat_history.messages)} messages")
+        if len(wf.agent.chat_history.messages) != 2:
+            print(f"❌ Expected 2 messages after one turn, found {len(wf.agent.chat_history.messages)}")
+            return False
         print(f"📝 Summary: {wf.agent.conversation_summary[:50]}..." if wf.agent.conversation_summary else "📝 No summary yet")
         
     except Exception as e:
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the tool observation cache (workflow/tools/observation_cache.py).
+Run with: python -m pytest test_observation_cache.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import workflow.tools.observation_cache as observation_cache
+from workflow.tools.observation_cache import ObservationCache
+
+
+class _Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _counting(observation):
+    """A tool function returning `observation` that records its calls."""
+    calls = []
+
+    def lookup(city):
+        calls.append(city)
+        return observation
+    return lookup, calls
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_hit_within_ttl_and_miss_after(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(observation_cache.time, "monotonic", clock)
+    lookup, calls = _counting({"temperature": 20})
+    cached = ObservationCache(ttl=300)(lookup)
+
+    assert cached("Paris") == {"temperature": 20}
+    clock.now += 299
+    assert cached(" paris ") == {"temperature": 20}
+    assert calls == ["Paris"]
+
+    clock.now += 2
+    assert cached("Paris") == {"temperature": 20}
+    assert calls == ["Paris", "Paris"]
+    assert cached.cache.hits == 1 and cached.cache.misses == 2
+
+
+def test_hits_return_copies():
+    lookup, _ = _counting({"temperature": 20})
+    cached = ObservationCache(ttl=300)(lookup)
+    cached("Paris")["temperature"] = -1
+    assert cached("Paris") == {"temperature": 20}
+
+
+def test_error_observations_are_not_cached():
+    lookup, calls = _counting({"error": "No matching location found."})
+    cached = ObservationCache(ttl=300)(lookup)
+    cached("Atlantis")
+    cached("Atlantis")
+    assert calls == ["Atlantis", "Atlantis"]
+
+
+def test_least_recently_used_city_is_evicted():
+    lookup, calls = _counting({"temperature": 20})
+    cached = ObservationCache(ttl=300, maxsize=2)(lookup)
+    cached("Paris")
+    cached("Rome")
+    cached("Paris")
+    cached("Tokyo")  # evicts Rome
+    cached("Rome")
+    assert calls == ["Paris", "Rome", "Tokyo", "Rome"]
+
+
+def test_concurrent_callers_share_one_call():
+    release = threading.Event()
+    calls = []
+
+    def lookup(city):
+        calls.append(city)
+        release.wait(5)
+        return {"temperature": 20}
+    cached = ObservationCache(ttl=300)(lookup)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cached("Paris"))) for _ in range(3)]
+    threads[0].start()
+    _wait_until(lambda: calls)
+    for thread in threads[1:]:
+        thread.start()
+    _wait_until(lambda: cached.cache.hits == 2)  # both are waiting on the first call
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ["Paris"]
+    assert results == [{"temperature": 20}] * 3
+
+
+def test_exception_reaches_waiters_and_clears_inflight():
+    release = threading.Event()
+    calls = []
+
+    def lookup(city):
+        calls.append(city)
+        release.wait(5)
+        raise ConnectionError("timed out")
+    cached = ObservationCache(ttl=300)(lookup)
+
+    errors = []
+
+    def call():
+        try:
+            cached("Paris")
+        except ConnectionError as e:
+            errors.append(e)
+
+    owner, waiter = threading.Thread(target=call), threading.Thread(target=call)
+    owner.start()
+    _wait_until(lambda: calls)
+    waiter.start()
+    _wait_until(lambda: cached.cache.hits == 1)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert len(errors) == 2
+    assert cached.cache._inflight == {}
+    # The failure was not cached, so the next call tries again
+    with pytest.raises(ConnectionError):
+        cached("Paris")
+    assert calls == ["Paris", "Paris"]
+
+
+def test_misses_log_the_hit_rate(caplog):
+    lookup, _ = _counting({"temperature": 20})
+    cached = ObservationCache(ttl=300)(lookup)
+    with caplog.at_level("DEBUG", logger=observation_cache.__name__):
+        cached("Paris")
+        cached("Paris")
+        cached("Rome")
+    assert [record.getMessage() for record in caplog.records] == [
+        "lookup: cache miss for 'paris', hit rate 0%",
+        "lookup: cache miss for 'rome', hit rate 33%",
+    ]
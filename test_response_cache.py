@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the agent's response cache (workflow/response_cache.py).
+Run with: python -m pytest test_response_cache.py
+"""
+
+import workflow.response_cache as response_cache
+from workflow.response_cache import ResponseCache
+
+
+class _Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _with_clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(response_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_rephrasings_share_an_entry():
+    cache = ResponseCache()
+    cache.put("ctx", "What's the weather in Tokyo?", "sunny")
+    assert cache.get("ctx", "weather in tokyo") == "sunny"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _with_clock(monkeypatch)
+    cache = ResponseCache(ttl=300)
+    cache.put("ctx", "weather in Tokyo", "sunny")
+
+    clock.now += 299
+    assert cache.get("ctx", "weather in Tokyo") == "sunny"
+    clock.now += 2
+    assert cache.get("ctx", "weather in Tokyo") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(maxsize=2)
+    cache.put("ctx", "weather in Tokyo", "tokyo")
+    cache.put("ctx", "weather in Paris", "paris")
+    assert cache.get("ctx", "weather in Tokyo") == "tokyo"  # Paris is now least recent
+
+    cache.put("ctx", "weather in Rome", "rome")
+    assert cache.get("ctx", "weather in Paris") is None
+    assert cache.get("ctx", "weather in Tokyo") == "tokyo"
+    assert cache.get("ctx", "weather in Rome") == "rome"
+
+
+def test_entries_are_scoped_by_context():
+    cache = ResponseCache()
+    cache.put("conversation-1", "weather in Tokyo", "sunny")
+    assert cache.get("conversation-2", "weather in Tokyo") is None
+
+
+def test_negation_is_a_different_query():
+    cache = ResponseCache()
+    cache.put("ctx", "Should I bring an umbrella to London?", "yes")
+    assert cache.get("ctx", "Should I not bring an umbrella to London?") is None
+
+
+def test_word_order_is_a_different_query():
+    cache = ResponseCache()
+    cache.put("ctx", "Is London warmer than Paris?", "no")
+    assert cache.get("ctx", "Is Paris warmer than London?") is None
+
+
+def test_direction_is_a_different_query():
+    cache = ResponseCache()
+    cache.put("ctx", "Flights to Paris", "a")
+    assert cache.get("ctx", "Flights from Paris") is None
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the streaming concurrency limit (workflow/workflow.py).
+Run with: python -m pytest test_stream_slots.py
+"""
+
+import asyncio
+import threading
+
+from workflow.workflow import _StreamSlots
+
+
+def test_waiters_are_served_in_arrival_order():
+    async def main():
+        slots = _StreamSlots(1)
+        order = []
+        await slots.acquire()
+
+        async def wait(name):
+            await slots.acquire()
+            order.append(name)
+            slots.release()
+
+        tasks = []
+        for name in "abc":
+            tasks.append(asyncio.create_task(wait(name)))
+            await asyncio.sleep(0)  # let it queue before the next one
+        slots.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == ["a", "b", "c"]
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def main():
+        slots = _StreamSlots(1)
+        await slots.acquire()
+        waiter = asyncio.create_task(slots.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        slots.release()
+        await asyncio.wait_for(slots.acquire(), 1)
+
+    asyncio.run(main())
+
+
+def test_slot_is_handed_to_a_waiter_on_another_loop():
+    slots = _StreamSlots(1)
+    taken = threading.Event()
+    queued = threading.Event()
+    acquired = threading.Event()
+
+    async def hold():
+        await slots.acquire()
+        taken.set()
+        queued.wait(5)
+        await asyncio.sleep(0.01)
+        slots.release()
+
+    async def wait():
+        task = asyncio.create_task(slots.acquire())
+        await asyncio.sleep(0)
+        queued.set()
+        await asyncio.wait_for(task, 5)
+        acquired.set()
+        slots.release()
+
+    holder = threading.Thread(target=asyncio.run, args=(hold(),))
+    holder.start()
+    taken.wait(5)
+    waiter = threading.Thread(target=asyncio.run, args=(wait(),))
+    waiter.start()
+    holder.join(5)
+    waiter.join(5)
+    assert acquired.is_set()
+    assert slots._free == 1
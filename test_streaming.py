@@ -1,6 +1,111 @@
 import requests
 import json
+import socket
 import sys
+import time
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # orjson decodes the small per-token payloads noticeably faster
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+
+class StreamingAdapter(HTTPAdapter):
+    """HTTP adapter with an enlarged socket receive buffer for event streams."""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = [(socket.SOL_SOCKET, socket.SO_RCVBUF, 262144)]
+        super().init_poolmanager(*args, **kwargs)
+
+
+# Read size for iter_lines; the 512-byte default means many reads per SSE frame
+STREAM_CHUNK_SIZE = 65536
+
+# Events whose payload is printed as formatted JSON
+STRUCTURED_EVENTS = frozenset({'structured_output', 'structured_update'})
+
+# One keep-alive session shared by all tests, sized for the concurrent mode
+SESSION = requests.Session()
+SESSION.headers.update({'Accept': 'text/event-stream'})
+SESSION.mount("http://", StreamingAdapter(pool_connections=1, pool_maxsize=3))
+
+
+def parse_sse(line):
+    """Split a raw SSE line into its field name and value.
+    
+    Args:
+        line (bytes): A single line from the event stream
+        
+    Returns:
+        tuple: (field, value) where field is bytes and value has the optional
+        leading space removed
+    """
+    field, _, value = line.partition(b':')
+    return field, value[1:] if value.startswith(b' ') else value
+
+
+class TokenWriter:
+    """Coalesce streamed tokens into fewer stdout writes.
+    
+    Tokens are buffered and written out every `max_tokens` tokens or
+    `max_delay` seconds, whichever comes first.
+    """
+    
+    def __init__(self, max_tokens=16, max_delay=0.05):
+        self.max_tokens = max_tokens
+        self.max_delay = max_delay
+        self.buffer = []
+        self.last_flush = time.monotonic()
+    
+    def write(self, token):
+        self.buffer.append(token)
+        if len(self.buffer) >= self.max_tokens or time.monotonic() - self.last_flush >= self.max_delay:
+            self.flush()
+    
+    def flush(self):
+        if self.buffer:
+            sys.stdout.write(''.join(self.buffer))
+            self.buffer.clear()
+        sys.stdout.flush()
+        self.last_flush = time.monotonic()
+
+
+def _emit_token(data, tokens):
+    # Print tokens without newlines for a more natural output
+    tokens.write(data.get('content', ''))
+
+
+def _emit_thinking(data, tokens):
+    tokens.flush()
+    print(f"\nThinking: {data.get('content')}")
+
+
+def _emit_tool_usage(data, tokens):
+    tokens.flush()
+    print(f"\nUsing tool: {data.get('tool')} with input: {data.get('input')}")
+    print(f"Thought: {data.get('thought')}")
+
+
+def _emit_error(data, tokens):
+    tokens.flush()
+    print(f"\nError: {data.get('content')}")
+
+
+def _emit_unknown(data, tokens):
+    tokens.flush()
+    print(f"\nUnknown chunk type: {data}")
+
+
+# Chunk type -> printer for the /chat/stream endpoint
+CHUNK_HANDLERS = {
+    'token': _emit_token,
+    'thinking': _emit_thinking,
+    'tool_usage': _emit_tool_usage,
+    'error': _emit_error,
+}
 
 
 def test_streaming_api():
@@ -18,35 +123,26 @@ def test_streaming_api():
     }
     
     # Send the request with stream=True to get a streaming response
-    response = requests.post(url, json=payload, stream=True)
+    response = SESSION.post(url, json=payload, stream=True)
     
     # Check if the request was successful
     if response.status_code == 200:
         print(f"Sending message: {message}\n")
         print("Streaming response:")
+        tokens = TokenWriter()
         
         # Process the streaming response
-        for line in response.iter_lines():
+        for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=False):
             if line:
                 # SSE format: lines starting with 'data: '
-                if line.startswith(b'data: '):
+                field, value = parse_sse(line)
+                if field == b'data':
                     # Parse the JSON data
-                    data = json.loads(line[6:].decode('utf-8'))
+                    data = json_loads(value)
                     
-                    # Process different types of chunks
-                    if data.get('type') == 'thinking':
-                        print(f"\nThinking: {data.get('content')}")
-                    elif data.get('type') == 'tool_usage':
-                        print(f"\nUsing tool: {data.get('tool')} with input: {data.get('input')}")
-                        print(f"Thought: {data.get('thought')}")
-                    elif data.get('type') == 'token':
-                        # Print tokens without newlines for a more natural output
-                        sys.stdout.write(data.get('content', ''))
-                        sys.stdout.flush()
-                    elif data.get('type') == 'error':
-                        print(f"\nError: {data.get('content')}")
-                    else:
-                        print(f"\nUnknown chunk type: {data}")
+                    # Dispatch on the chunk type; unknown types fall through
+                    CHUNK_HANDLERS.get(data.get('type'), _emit_unknown)(data, tokens)
+        tokens.flush()
     else:
         print(f"Error: {response.status_code} - {response.text}")
 
@@ -65,27 +161,30 @@ def test_token_streaming_api():
     }
     
     # Send the request with stream=True to get a streaming response
-    response = requests.post(url, json=payload, stream=True)
+    response = SESSION.post(url, json=payload, stream=True)
     
     # Check if the request was successful
     if response.status_code == 200:
         print(f"Sending message: {message}\n")
         print("Streaming tokens:")
+        tokens = TokenWriter()
         
         # Process the streaming response
-        for line in response.iter_lines():
+        for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=False):
             if line:
                 # SSE format: lines starting with 'data: '
-                if line.startswith(b'data: '):
+                field, value = parse_sse(line)
+                if field == b'data':
                     # Parse the JSON data
-                    data = json.loads(line[6:].decode('utf-8'))
+                    data = json_loads(value)
                     
                     # Print tokens without newlines for a more natural output
                     if 'text' in data:
-                        sys.stdout.write(data['text'])
-                        sys.stdout.flush()
+                        tokens.write(data['text'])
                     elif 'type' in data and data['type'] == 'error':
+                        tokens.flush()
                         print(f"\nError: {data.get('content')}")
+        tokens.flush()
     else:
         print(f"Error: {response.status_code} - {response.text}")
 
@@ -103,38 +202,55 @@ def test_token_by_token_streaming_api():
     }
 
     print(f"Sending request to {url}...")
-    response = requests.post(url, headers=headers, json=data, stream=True)
+    response = SESSION.post(url, headers=headers, json=data, stream=True)
 
     print(f"Response status code: {response.status_code}")
     print(f"Response headers: {response.headers}")
 
     if response.status_code == 200:
         print("\nStreaming response:")
-        for line in response.iter_lines():
+        for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=False):
             if line:
-                decoded_line = line.decode('utf-8')
-                print(decoded_line)
+                print(line.decode('utf-8'))
                 
                 # Try to parse the data if it's in the expected format
-                if decoded_line.startswith('data: '):
+                field, value = parse_sse(line)
+                if field == b'data':
                     try:
-                        data_str = decoded_line[6:]
-                        data = json.loads(data_str)
-                        if 'event' in data and data['event'] in ['structured_output', 'structured_update']:
+                        data = json_loads(value)
+                        if 'event' in data and data['event'] in STRUCTURED_EVENTS:
                             print(f"\nReceived {data['event']}:")
                             print(json.dumps(data['data'], indent=2))
-                    except json.JSONDecodeError:
+                    except ValueError:
                         pass
     else:
         print(f"Error: {response.text}")
 
 
-if __name__ == "__main__":
-    print("Testing the streaming API...\n")
-    test_streaming_api()
-    
-    print("\n\nTesting the token-only streaming API...\n")
-    test_token_streaming_api()
+STREAMING_TESTS = [
+    ("Testing the streaming API...\n", test_streaming_api),
+    ("\n\nTesting the token-only streaming API...\n", test_token_streaming_api),
+    ("\n\nTesting the token-by-token streaming API...\n", test_token_by_token_streaming_api),
+]
+
+
+def run_parallel():
+    """Run all streaming tests concurrently.
     
-    print("\n\nTesting the token-by-token streaming API...\n")
-    test_token_by_token_streaming_api()
\ No newline at end of file
+    The tests are I/O-bound on the server, so total wall time is roughly the
+    slowest stream instead of the sum of all three. Output is interleaved.
+    """
+    print("Testing all streaming APIs concurrently...\n")
+    with ThreadPoolExecutor(max_workers=len(STREAMING_TESTS)) as executor:
+        futures = [executor.submit(test) for _, test in STREAMING_TESTS]
+        for future in futures:
+            future.result()
+
+
+if __name__ == "__main__":
+    if "--parallel" in sys.argv[1:]:
+        run_parallel()
+    else:
+        for banner, test in STREAMING_TESTS:
+            print(banner)
+            test()
@@ -23,8 +23,9 @@ if not api_key:
     print("Please set it using: export GROQ_API_KEY='your-api-key'")
     sys.exit(1)
 
-# Initialize the Agent with a smaller token limit for testing
-agent = Agent(provider="groq", model_name="deepseek-r1-distill-llama-70b", temperature=0.7)
+# Initialize the Agent with a smaller token limit for testing; the LLM client is
+# built in the background and the first process_input call waits for it
+agent = Agent(provider="groq", model_name="deepseek-r1-distill-llama-70b", temperature=0.7, background_init=True)
 agent.set_max_token_limit(5000)  # Set a smaller limit for testing
 
 def print_separator():
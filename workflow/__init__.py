@@ -1,7 +1,30 @@
-# Import the workflow components
-from .workflow import Workflow, execute_workflow, invoke
+import importlib
 
-# Import the agent
-from .agent import Agent
+# Public names are resolved lazily (PEP 562) so importing a submodule such as
+# workflow.tools does not pull in the agent, LangChain and the LLM clients
+_LAZY_IMPORTS = {
+    # The workflow components
+    'Workflow': ('.workflow', 'Workflow'),
+    'get_workflow': ('.workflow', 'get_workflow'),
+    'execute_workflow': ('.workflow', 'execute_workflow'),
+    'invoke': ('.workflow', 'invoke'),
+    # The agent
+    'Agent': ('.agent', 'Agent'),
+}
 
-__all__ = ['Workflow', 'Agent', 'execute_workflow', 'invoke']
\ No newline at end of file
+__all__ = ['Workflow', 'get_workflow', 'Agent', 'execute_workflow', 'invoke']
+
+
+def __getattr__(name):
+    try:
+        module_name, attr = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module_name, __name__), attr)
+    # Cache on the package so later lookups bypass __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,345 +1,878 @@
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain.prompts import PromptTemplate
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.messages import HumanMessage, AIMessage
+import asyncio
+import copy
+import hashlib
+import logging
 import os
+import threading
 import warnings
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import ClassVar
 
-# Suppress deprecation warnings for cleaner output
-warnings.filterwarnings("ignore", category=DeprecationWarning)
+_log = logging.getLogger(__name__)
 
 # Import the tools from the tools package
-from .tools import tools
+from .tools import tools, is_known_city, WEATHER_CACHE_TTL
 from .prompts import Prompts
 from .llm_factory import LLMFactory
+from .response_cache import ResponseCache
+from .memory import create_chat_history, format_masked, format_messages
+from .fast_path import classify, find_city, usable_observations
+from .prompt_compression import compress_context
+from .patterns import extract_parse_error, split_thinking
 
-class Agent:
-    def __init__(self, provider="openai", model_name=None, temperature=0.7, **kwargs):
-        """Initialize the Agent with a configurable LLM.
-        
-        Args:
-            provider: The LLM provider (openai, groq, google)
-            model_name: The specific model name to use (defaults to provider's default)
-            temperature: The temperature for the LLM
-            **kwargs: Additional arguments to pass to the LLM constructor
-        """
+# Cache of successful process_input results, scoped by (llm config, memory digest)
+# and matched on the normalized user input. Set TRIP_AGENT_NOCACHE=1 to disable.
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = WEATHER_CACHE_TTL  # Seconds; no older than the weather observations
+_response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+class _BlankMissing(dict):
+    """Observation view that formats missing fields as empty strings."""
+    
+    def __missing__(self, key):
+        return ""
+
+_WEATHER_TEMPLATE = ("Currently {temperature} and {weather}. "
+                     "Humidity is {humidity} with wind speed of {wind_speed}.")
+_TIME_TEMPLATE = "The local time is {datetime} ({timezone})."
+
+def _format_city_facts(facts):
+    return facts.get("summary", "")
+
+def _format_weather(weather):
+    return _WEATHER_TEMPLATE.format_map(_BlankMissing(weather))
+
+def _format_weather_batch(weather_by_city):
+    return "\n".join(f"{city}: {_format_weather(weather)}"
+                     for city, weather in weather_by_city.items() if "error" not in weather)
+
+def _format_time(time):
+    return _TIME_TEMPLATE.format_map(_BlankMissing(time))
+
+# Single source of truth for the tools process_input reports: maps the tool
+# name to the formatter that turns its observation into answer text. Used by
+# the fast path and the iteration-limit fallback, in the order the fallback
+# parts appear in the answer; a new tool only needs an entry here
+_TOOL_HANDLERS = {
+    "CityFactsTool": _format_city_facts,
+    "WeatherTool": _format_weather,
+    "WeatherBatchTool": _format_weather_batch,
+    "TimeTool": _format_time,
+}
+
+_TOOLS_BY_NAME = {tool.name: tool for tool in tools}
+
+def _extract_city(tool_input):
+    """Normalize a tool input (string, dict or other) to the city name."""
+    if isinstance(tool_input, str):
+        return tool_input.strip().strip('"\'')
+    if isinstance(tool_input, dict):
+        return tool_input.get("city", "")
+    return str(tool_input)
+
+# Reasoning reported when the agent answered without using a tool
+_DEFAULT_THINKING = "To help you with your request, I'll gather some relevant information."
+
+# Tools whose observations are cached (see tools.ObservationCache); prefetching
+# them warms the cache the agent's own tool calls read from
+_PREFETCH_TOOLS = tuple(tool for tool in tools if hasattr(tool.func, "cache"))
+# Runs speculative tool calls, apart from the agent's own tool calls so they never delay them
+_prefetch_pool = ThreadPoolExecutor(max_workers=len(_PREFETCH_TOOLS) or 1, thread_name_prefix="agent-prefetch")
+
+# Runs background summarizations for all agents
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="agent-summary")
+
+# Token budget for the verbatim chat history; older turns are summarized once
+# the history exceeds SUMMARY_TRIGGER_RATIO of it
+DEFAULT_MAX_TOKEN_LIMIT = 2000
+SUMMARY_TRIGGER_RATIO = 0.75
+# Default number of concurrent requests in Agent.process_batch
+BATCH_CONCURRENCY_LIMIT = 8
+# Length cap of the summary built without the LLM when summarization fails
+FALLBACK_SUMMARY_CHARS = 2000
+# Cheaper model of the same provider for summarizing old turns; unset to use the agent's LLM
+SUMMARY_MODEL = os.getenv("TRIP_AGENT_SUMMARY_MODEL")
+
+class AgentResult(Mapping):
+    """Read-only process_input result.
+    
+    Behaves like the {"response", "tool_calls", "reasoning", "function_calls"}
+    dict returned before; the two step lists are built from the intermediate
+    steps on first access, so callers that only read the response skip that work.
+    Paths without intermediate steps pass the lists directly.
+    """
+    
+    __slots__ = ("response", "reasoning", "_steps", "_verbose_tools", "_tool_calls", "_function_calls")
+    _KEYS = ("response", "tool_calls", "reasoning", "function_calls")
+    
+    def __init__(self, response, reasoning, steps=(), verbose_tools=True, tool_calls=None, function_calls=None):
+        self.response = response
+        self.reasoning = reasoning
+        self._steps = steps
+        self._verbose_tools = verbose_tools
+        self._tool_calls = tool_calls
+        self._function_calls = function_calls
+    
+    def _build_calls(self):
+        # One pass over the steps fills both lists, since callers that read
+        # one usually read the other
+        tool_calls = []
+        function_calls = []
+        append_tool_call = tool_calls.append
+        append_function_call = function_calls.append
+        verbose_tools = self._verbose_tools
+        for action, observation in self._steps:
+            tool = action.tool
+            tool_input = action.tool_input
+            if verbose_tools:
+                append_tool_call({
+                    "thought": action.log,
+                    "action": tool,
+                    "action_input": tool_input,
+                    "observation": observation
+                })
+            if tool in _TOOL_HANDLERS:
+                append_function_call({"tool": tool, "parameters": {"city": _extract_city(tool_input)}})
+        self._tool_calls, self._function_calls = tool_calls, function_calls
+    
+    @property
+    def tool_calls(self):
+        """Per-step reasoning; empty unless verbose_tools was requested."""
+        if self._tool_calls is None:
+            self._build_calls()
+        return self._tool_calls
+    
+    @property
+    def function_calls(self):
+        if self._function_calls is None:
+            self._build_calls()
+        return self._function_calls
+    
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __iter__(self):
+        return iter(self._KEYS)
+    
+    def __len__(self):
+        return len(self._KEYS)
+    
+    def to_dict(self):
+        return dict(self)
+
+def _create_llm_components(provider, model_name, temperature, kwargs):
+    """Create the LLM, the React agent and its executor.
+    
+    Returns:
+        tuple: (llm, agent, agent_executor)
+    """
+    # Silence LangChain deprecation notices raised while building the components,
+    # without changing the warning filters of the importing application
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
         # Initialize the LLM using the factory
-        self.llm = LLMFactory.create_llm(
+        llm = LLMFactory.create_llm(
             provider=provider,
             model_name=model_name,
             temperature=temperature,
             **kwargs
         )
         
-        # Initialize modern chat message history
-        self.chat_history = ChatMessageHistory()
-        self.conversation_summary = ""
-        self.max_messages = 10  # Keep last 10 messages before summarizing
-        
-        # Create a simple memory interface for backward compatibility
-        class MemoryInterface:
-            def __init__(self, agent_instance):
-                self.agent = agent_instance
-                
-            def load_memory_variables(self, inputs):
-                # Return conversation history as string for compatibility
-                messages = self.agent.chat_history.messages
-                if not messages:
-                    return {'history': ''}
-                
-                # Format messages as conversation string
-                history_str = ""
-                for msg in messages:
-                    if isinstance(msg, HumanMessage):
-                        history_str += f"Human: {msg.content}\n"
-                    elif isinstance(msg, AIMessage):
-                        history_str += f"AI: {msg.content}\n"
-                
-                return {'history': history_str}
-            
-            def save_context(self, inputs, outputs):
-                # Add messages to chat history
-                user_input = inputs.get('input', '')
-                ai_output = outputs.get('output', '')
-                
-                if user_input:
-                    self.agent.chat_history.add_user_message(user_input)
-                if ai_output:
-                    self.agent.chat_history.add_ai_message(ai_output)
-                
-                # Summarize if we have too many messages
-                if len(self.agent.chat_history.messages) > self.agent.max_messages:
-                    self.agent._summarize_conversation()
-            
-            def clear(self):
-                self.agent.chat_history.clear()
-                self.agent.conversation_summary = ""
-            
-            @property
-            def moving_summary_buffer(self):
-                return self.agent.conversation_summary
-            
-            @property
-            def chat_memory(self):
-                return self.agent.chat_history
-        
-        self.memory = MemoryInterface(self)
-        
-        # Create the prompt template for the React agent using the Prompts class
-        self.prompt = PromptTemplate.from_template(Prompts.get_react_prompt())
-        
         # Create the React agent
-        self.agent = create_react_agent(
-            llm=self.llm,
+        agent = create_react_agent(
+            llm=llm,
             tools=tools,
-            prompt=self.prompt
+            prompt=Agent._REACT_PROMPT
         )
         
         # Create the agent executor
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
+        agent_executor = AgentExecutor(
+            agent=agent,
             tools=tools,
-            verbose=True,
+            verbose=os.getenv("TRIP_AGENT_VERBOSE") == "1",  # Step tracing to stdout, off by default
             handle_parsing_errors=True,
             max_iterations=5,  # Increased from 3 to 5 to allow more time for tool usage
             return_intermediate_steps=True
         )
+    return llm, agent, agent_executor
+
+@lru_cache(maxsize=32)
+def _build_executor(provider, model_name, temperature, kwargs):
+    """Shared LLM components per configuration.
     
-    def _summarize_conversation(self):
-        """Summarize the conversation when it gets too long."""
-        try:
-            messages = self.chat_history.messages
-            if len(messages) <= 2:
-                return
-            
-            # Create a summary of the conversation
-            conversation_text = ""
-            for msg in messages[:-2]:  # Keep the last 2 messages
-                if isinstance(msg, HumanMessage):
-                    conversation_text += f"Human: {msg.content}\n"
-                elif isinstance(msg, AIMessage):
-                    conversation_text += f"AI: {msg.content}\n"
-            
-            # Use the LLM to create a summary
-            summary_prompt = f"""Please provide a concise summary of the following conversation:
+    The LLM client and executor hold no per-conversation state (memory lives
+    on the Agent and callbacks are passed per call), so agents created with
+    the same configuration reuse them and construction after warmup is O(1).
+    
+    Args:
+        kwargs (frozenset): The extra LLM arguments as (name, value) pairs
+    """
+    return _create_llm_components(provider, model_name, temperature, dict(kwargs))
 
-{conversation_text}
+class MemoryInterface:
+    """Memory facade over an Agent's chat history and summary, kept for backward compatibility."""
+    
+    def __init__(self, agent_instance):
+        self.agent = agent_instance
+        
+    def load_memory_variables(self, inputs):
+        # Return conversation history as string for compatibility; the
+        # transcript is cached until the history changes
+        return {'history': self.agent.chat_history.formatted()}
+    
+    def save_context(self, inputs, outputs):
+        # Add messages to chat history
+        user_input = inputs.get('input', '')
+        ai_output = outputs.get('output', '')
+        
+        with self.agent._history_lock:
+            if user_input:
+                self.agent.chat_history.add_user_message(user_input)
+                self.agent._add_message_tokens(user_input)
+            if ai_output:
+                self.agent.chat_history.add_ai_message(ai_output)
+                self.agent._add_message_tokens(ai_output)
+            over_budget = self.agent._over_budget()
+        
+        # Summarize once the history fills most of its token budget
+        if over_budget:
+            self.agent._schedule_summary()
+    
+    def clear(self):
+        with self.agent._history_lock:
+            self.agent.chat_history.clear()
+            self.agent.conversation_summary = ""
+            self.agent._history_tokens = 0
+            self.agent._message_tokens = []
+            self.agent._last_summarized = 0
+            # Invalidate any summarization still in flight
+            self.agent._history_epoch += 1
+    
+    @property
+    def moving_summary_buffer(self):
+        return self.agent.conversation_summary
+    
+    @property
+    def chat_memory(self):
+        return self.agent.chat_history
 
-Summary:"""
+class Agent:
+    # Fixed attribute layout: no per-instance __dict__, and attribute reads on
+    # the request path are slot loads. Add new instance attributes here.
+    __slots__ = (
+        "_ready", "_init_error", "_llm", "_agent", "_agent_executor", "_cache_namespace",
+        "chat_history", "_conversation_summary", "max_token_limit", "_history_tokens",
+        "_message_tokens", "_token_counter", "_last_summarized", "background_summary", "fast_path",
+        "prefetch", "_history_lock", "_summary_lock", "_summary_pending", "_history_epoch",
+        "_prefix_source", "_prefix", "_memory_key_source", "_memory_key_value",
+        "memory", "prompt", "__weakref__",
+    )
+    
+    # Parsed once and shared; PromptTemplate is immutable after construction
+    _REACT_PROMPT: ClassVar[PromptTemplate] = PromptTemplate.from_template(Prompts.get_react_prompt())
+    
+    def __init__(self, provider="openai", model_name=None, temperature=0.7, background_init=False,
+                 background_summary=True, session_id="default", **kwargs):
+        """Initialize the Agent with a configurable LLM.
+        
+        Args:
+            provider: The LLM provider (openai, groq, google)
+            model_name: The specific model name to use (defaults to provider's default)
+            temperature: The temperature for the LLM
+            background_init: Build the LLM client and agent executor on a background
+                thread; the first access to llm, agent or agent_executor waits for it
+            background_summary: Summarize older turns on a worker thread so the
+                response is returned without waiting for the summarizer LLM call
+            session_id: Conversation key used when the history is persisted
+                (TRIP_AGENT_HISTORY_DB is set)
+            **kwargs: Additional arguments to pass to the LLM constructor
+        """
+        self._ready = threading.Event()
+        self._init_error = None
+        if background_init:
+            threading.Thread(
+                target=self._init_llm_components,
+                args=(provider, model_name, temperature, kwargs),
+                daemon=True
+            ).start()
+        else:
+            self._init_llm_components(provider, model_name, temperature, kwargs)
+            # Surface construction errors immediately
+            self._wait_ready()
+        self._cache_namespace = (provider, model_name, temperature, repr(sorted(kwargs.items())))
+        
+        # Initialize modern chat message history, restoring a persisted summary
+        self.chat_history = create_chat_history(session_id)
+        load_summary = getattr(self.chat_history, "load_summary", None)
+        self._conversation_summary = load_summary() if load_summary else ""
+        self.max_token_limit = DEFAULT_MAX_TOKEN_LIMIT  # Token budget for the verbatim chat history
+        self._history_tokens = 0  # Running token count of the chat history
+        self._message_tokens = []  # Token count of each chat message, so each is tokenized once
+        self._token_counter = None  # Resolved on first use by _count_tokens
+        self._last_summarized = 0  # Number of leading chat messages already folded into the summary
+        self.background_summary = background_summary
+        self.fast_path = os.getenv("TRIP_AGENT_FAST_PATH", "1") != "0"  # Answer single-tool queries without the React loop
+        self.prefetch = os.getenv("TRIP_AGENT_PREFETCH", "1") != "0"  # Start cached tool calls while the agent deliberates
+        self._history_lock = threading.RLock()  # Guards chat_history and the counters above
+        self._summary_lock = threading.Lock()  # Serializes summarizer runs
+        self._summary_pending = False  # A background summarization is queued or running
+        self._history_epoch = 0  # Bumped by clear() to discard in-flight summaries
+        self._prefix_source = ("", "")  # (summary, history) the cached prompt prefix was built from
+        self._prefix = ""
+        self._memory_key_source = None  # (summary, history) the cached memory digest was built from
+        self._memory_key_value = None
+        
+        # Create a simple memory interface for backward compatibility
+        self.memory = MemoryInterface(self)
+        
+        # Create the prompt template for the React agent using the Prompts class
+        self.prompt = Agent._REACT_PROMPT
+    
+    @property
+    def conversation_summary(self):
+        return self._conversation_summary
+    
+    @conversation_summary.setter
+    def conversation_summary(self, summary):
+        self._conversation_summary = summary
+        save_summary = getattr(self.chat_history, "save_summary", None)
+        if save_summary:
+            save_summary(summary)
+    
+    def _init_llm_components(self, provider, model_name, temperature, kwargs):
+        """Create the LLM, the React agent and its executor, then mark the agent ready."""
+        try:
+            try:
+                key = (provider, model_name, temperature, frozenset(kwargs.items()))
+                hash(key)
+            except TypeError:
+                # Unhashable LLM arguments; build a private set of components
+                components = _create_llm_components(provider, model_name, temperature, kwargs)
+            else:
+                components = _build_executor(*key)
+            self._llm, self._agent, self._agent_executor = components
+        except Exception as e:
+            self._init_error = e
+        finally:
+            self._ready.set()
+    
+    def _wait_ready(self):
+        """Block until the LLM components exist, re-raising any construction error."""
+        self._ready.wait()
+        if self._init_error is not None:
+            raise self._init_error
+    
+    @property
+    def llm(self):
+        self._wait_ready()
+        return self._llm
+    
+    @property
+    def agent(self):
+        self._wait_ready()
+        return self._agent
+    
+    @property
+    def agent_executor(self):
+        self._wait_ready()
+        return self._agent_executor
+    
+    def _predict_new_summary(self, messages, previous_summary):
+        """Summarize `messages` with the LLM and fold the result into `previous_summary`.
+        
+        Args:
+            messages: The messages not yet covered by `previous_summary`
+            previous_summary (str): The existing summary, may be empty
             
+        Returns:
+            str: The updated summary
+        """
+        # Create a summary of the conversation
+        conversation_text = format_messages(messages)
+        
+        # Merge the previous summary and the new turns with a single LLM call
+        summary_prompt = Prompts.get_summary_prompt().format(
+            summary=previous_summary or "(none)",
+            conversation=conversation_text
+        )
+        
+        if SUMMARY_MODEL:
+            # LLMFactory shares one client per configuration
+            llm = LLMFactory.create_llm(provider=self._cache_namespace[0], model_name=SUMMARY_MODEL, temperature=0)
+        else:
+            llm = self.llm
+        return llm.invoke(summary_prompt).content
+    
+    def _count_tokens(self, text):
+        """Count tokens with the LLM's tokenizer, falling back to ~4 characters per token."""
+        if self._token_counter is None:
             try:
-                new_summary = self.llm.invoke(summary_prompt).content
+                self.llm.get_num_tokens("")
+                self._token_counter = self.llm.get_num_tokens
+            except Exception:
+                self._token_counter = lambda value: len(value) // 4 + 1
+        return self._token_counter(text)
+    
+    def _add_message_tokens(self, text):
+        """Record the token count of a message just appended to the chat history."""
+        tokens = self._count_tokens(text)
+        self._message_tokens.append(tokens)
+        self._history_tokens += tokens
+    
+    def _drop_oldest_messages(self, count):
+        """Remove the `count` oldest messages from the chat history.
+        
+        Messages appended while a summary was being generated are kept.
+        """
+        with self._history_lock:
+            # Evict in place instead of clearing and re-adding the kept messages
+            self.chat_history.drop_oldest(count)
+            
+            # Reuse the stored per-message counts; recount only if they are out of
+            # step with the history (e.g. messages restored from a persisted session)
+            message_tokens = self._message_tokens
+            del message_tokens[:count]
+            messages = self.chat_history.messages
+            if len(message_tokens) != len(messages):
+                message_tokens[:] = [self._count_tokens(msg.content) for msg in messages]
+            self._history_tokens = sum(message_tokens)
+            
+            # Messages already folded into the summary are shifted out with the dropped ones
+            self._last_summarized = max(0, self._last_summarized - count)
+    
+    def _schedule_summary(self):
+        """Summarize now, or queue one background run if none is pending."""
+        if not self.background_summary:
+            self._summarize_conversation()
+            return
+        
+        with self._history_lock:
+            if self._summary_pending:
+                return
+            self._summary_pending = True
+        _summary_pool.submit(self._run_background_summary)
+    
+    def _over_budget(self):
+        """Whether the verbatim history fills most of its token budget; call under _history_lock."""
+        return self._history_tokens > SUMMARY_TRIGGER_RATIO * self.max_token_limit
+    
+    def _run_background_summary(self):
+        try:
+            self._summarize_conversation()
+        finally:
+            with self._history_lock:
+                self._summary_pending = False
+                # Turns saved while this run was in flight were skipped by
+                # _schedule_summary; catch up now instead of on the next save
+                rerun = self._over_budget() and len(self.chat_history.messages) > 2
+            if rerun:
+                self._schedule_summary()
+    
+    def _summarize_conversation(self):
+        """Summarize the conversation when it gets too long."""
+        try:
+            with self._summary_lock:
+                with self._history_lock:
+                    messages = self.chat_history.messages
+                    if len(messages) <= 2:
+                        return
+                    # Everything but the last 2 messages is folded into the summary;
+                    # only the window not already covered by update_summary() is
+                    # copied and sent, so the work is O(new messages)
+                    drop_count = len(messages) - 2
+                    new_messages = messages[self._last_summarized:drop_count]
+                    epoch = self._history_epoch
+                    previous_summary = self.conversation_summary
                 
-                # Combine with existing summary if any
-                if self.conversation_summary:
-                    combined_prompt = f"""Please combine these two conversation summaries into one concise summary:
-
-Previous summary: {self.conversation_summary}
-
-New summary: {new_summary}
-
-Combined summary:"""
-                    self.conversation_summary = self.llm.invoke(combined_prompt).content
-                else:
-                    self.conversation_summary = new_summary
+                try:
+                    summary = self._predict_new_summary(new_messages, previous_summary) if new_messages else previous_summary
+                except Exception as e:
+                    _log.warning("Error creating summary with LLM: %s", e)
+                    # Fallback: keep the questions and mask the answers, capped so
+                    # repeated failures cannot grow the summary without bound
+                    summary = f"{previous_summary}\n{format_masked(new_messages)}".strip()[-FALLBACK_SUMMARY_CHARS:]
                 
-                # Keep only the last 2 messages
-                recent_messages = messages[-2:]
-                self.chat_history.clear()
-                for msg in recent_messages:
-                    if isinstance(msg, HumanMessage):
-                        self.chat_history.add_user_message(msg.content)
-                    elif isinstance(msg, AIMessage):
-                        self.chat_history.add_ai_message(msg.content)
-                        
-            except Exception as e:
-                print(f"Error creating summary with LLM: {e}")
-                # Fallback: simple truncation
-                self.conversation_summary = f"Previous conversation covered various topics. Recent messages kept."
-                recent_messages = messages[-2:]
-                self.chat_history.clear()
-                for msg in recent_messages:
-                    if isinstance(msg, HumanMessage):
-                        self.chat_history.add_user_message(msg.content)
-                    elif isinstance(msg, AIMessage):
-                        self.chat_history.add_ai_message(msg.content)
+                with self._history_lock:
+                    if epoch != self._history_epoch:
+                        # The memory was cleared while the summary was generated
+                        return
+                    self.conversation_summary = summary
+                    self._drop_oldest_messages(drop_count)
                         
         except Exception as e:
-            print(f"Error in conversation summarization: {e}")
+            _log.exception("Error in conversation summarization: %s", e)
     
-    def process_input(self, state):
-        user_input = state.get("input", "") if isinstance(state, dict) else state
+    def _context_prefix(self):
+        """Return the summary and history block that precedes the current question.
         
-        try:
-            # Get conversation summary and history from memory using load_memory_variables
-            memory_variables = self.memory.load_memory_variables({})
-            conversation_context = ""
-            
-            # Handle memory output (string format)
-            if 'history' in memory_variables and memory_variables['history']:
-                conversation_context = memory_variables['history']
-            
-            # Get conversation summary
-            summary = self.conversation_summary
-            
-            # Construct enhanced input with proper context
+        The block is rebuilt only when the summary or the chat history changed,
+        so the optional history compression also runs once per change.
+        """
+        summary = self.conversation_summary
+        conversation_context = self.chat_history.formatted()
+        source = (summary, conversation_context)
+        if source != self._prefix_source:
+            conversation_context = compress_context(conversation_context)
             if summary and conversation_context:
-                enhanced_input = f"Previous Conversation Summary:\n{summary}\n\nRecent Conversation:\n{conversation_context}\n\nCurrent Question: {user_input}"
+                prefix = f"Previous Conversation Summary:\n{summary}\n\nRecent Conversation:\n{conversation_context}\n\n"
             elif summary:
-                enhanced_input = f"Previous Conversation Summary:\n{summary}\n\nCurrent Question: {user_input}"
+                prefix = f"Previous Conversation Summary:\n{summary}\n\n"
             elif conversation_context:
-                enhanced_input = f"Conversation History:\n{conversation_context}\n\nCurrent Question: {user_input}"
+                prefix = f"Conversation History:\n{conversation_context}\n\n"
             else:
-                enhanced_input = f"Current Question: {user_input}"
-            
-            # Use the React agent to process the enhanced input
-            result = self.agent_executor.invoke({"input": enhanced_input})
-            
-            # Save the conversation to memory - this will trigger summarization if needed
-            self.memory.save_context(
-                {"input": user_input},
-                {"output": result.get("output", "")}
-            )
-            
-
-            
-            # Extract intermediate steps for transparency
-            intermediate_steps = result.get("intermediate_steps", [])
-            reasoning_steps = []
-            function_calls = []
-            
-            # Extract the agent's thinking from the output
-            output = result.get("output", "I couldn't process your request.")
-            
-            # Check if the output indicates the agent stopped due to iteration limit
-            if output == "Agent stopped due to iteration limit or time limit.":
-                # Create a better response by combining the tool observations
-                city_facts = ""
-                weather_info = ""
-                time_info = ""
-                
-                # Extract information from the intermediate steps
-                for step in intermediate_steps:
-                    action = step[0]
-                    observation = step[1]
-                    
-                    if action.tool == "CityFactsTool" and isinstance(observation, dict):
-                        city_facts = observation.get("summary", "")
-                    elif action.tool == "WeatherTool" and isinstance(observation, dict):
-                        weather = observation
-                        weather_info = f"Currently {weather.get('temperature', '')} and {weather.get('weather', '')}. "
-                        weather_info += f"Humidity is {weather.get('humidity', '')} with wind speed of {weather.get('wind_speed', '')}." 
-                    elif action.tool == "TimeTool" and isinstance(observation, dict):
-                        time = observation
-                        time_info = f"The local time is {time.get('datetime', '')} ({time.get('timezone', '')})." 
-                
-                # Combine all information into a comprehensive response
-                if city_facts or weather_info or time_info:
-                    output = f"{city_facts}\n\n{weather_info}\n\n{time_info}"
-            
-            thinking = ""
+                prefix = ""
+            self._prefix_source, self._prefix = source, prefix
+        return self._prefix
+    
+    def build_enhanced_input(self, user_input):
+        """Prepend the conversation summary and recent history to the user input.
+        
+        Args:
+            user_input (str): The user's message
             
-            # Extract the first thought from the agent's reasoning
-            if intermediate_steps and hasattr(intermediate_steps[0][0], 'log'):
-                thought_parts = intermediate_steps[0][0].log.split('\n')
-                if thought_parts and thought_parts[0].startswith("Thought:"):
-                    thinking = thought_parts[0].replace("Thought: ", "")
-                else:
-                    thinking = intermediate_steps[0][0].log
-            else:
-                thinking = "To help you with your request, I'll gather some relevant information."
+        Returns:
+            str: The input passed to the React agent
+        """
+        return f"{self._context_prefix()}Current Question: {user_input}"
+    
+    def _memory_key(self):
+        """Digest of the summary and chat history, used to key the response cache.
+        
+        The digest is recomputed only when the summary or history changed; the
+        cached transcript string is a new object after every change, so an
+        identity check is enough.
+        """
+        summary, history = self.conversation_summary, self.chat_history.formatted()
+        cached = self._memory_key_source
+        if cached is None or cached[0] is not summary or cached[1] is not history:
+            state = repr((summary, history))
+            self._memory_key_value = hashlib.blake2b(state.encode(), digest_size=16).digest()
+            self._memory_key_source = (summary, history)
+        return self._memory_key_value
+    
+    def _try_fast_path(self, user_input, verbose_tools):
+        """Answer a fixed-tool query by calling the tools directly.
+        
+        A single-tool query ("weather in Paris") is answered from the formatted
+        observation. A city overview ("tell me about Paris") runs its tools
+        concurrently and writes the answer with one LLM call.
+        
+        Args:
+            user_input (str): The user's message
+            verbose_tools (bool): Whether to fill "tool_calls"
             
-            # Format the intermediate steps for better readability and extract function calls
-            for step in intermediate_steps:
-                action = step[0]
-                observation = step[1]
-                
-                # Add to reasoning steps for backward compatibility
+        Returns:
+            AgentResult: The response in the process_input format, or None when the
+                query needs the React agent or the tools returned errors
+        """
+        intent = classify(user_input)
+        if intent is None:
+            return None
+        
+        tool_names, city = intent
+        if len(tool_names) == 1:
+            observations = {tool_names[0]: _TOOLS_BY_NAME[tool_names[0]].func(city)}
+        else:
+            # One thread per tool for this request only, so overviews never queue
+            # behind each other
+            observations = {}
+            with ThreadPoolExecutor(max_workers=len(tool_names), thread_name_prefix="agent-overview") as pool:
+                futures = {name: pool.submit(_TOOLS_BY_NAME[name].func, city) for name in tool_names}
+                for name, future in futures.items():
+                    try:
+                        observations[name] = future.result()
+                    except Exception as e:
+                        observations[name] = {"error": str(e)}
+        
+        # Only observations without errors or fallbacks are used; with none,
+        # defer to the agent
+        usable = usable_observations(observations)
+        if not usable:
+            return None
+        
+        parts = [_TOOL_HANDLERS[name](observation) for name, observation in usable.items()]
+        if len(tool_names) == 1:
+            output = parts[0]
+        else:
+            try:
+                overview_prompt = Prompts.get_city_overview_prompt().format(
+                    city=city,
+                    observations="\n\n".join(parts)
+                )
+                output = self.llm.invoke(overview_prompt).content
+            except Exception as e:
+                _log.warning("Error writing city overview with LLM: %s", e)
+                output = "\n\n".join(parts)
+        
+        self.memory.save_context({"input": user_input}, {"output": output})
+        
+        reasoning_steps = []
+        if verbose_tools:
+            for name, observation in observations.items():
                 reasoning_steps.append({
-                    "thought": action.log,
-                    "action": action.tool,
-                    "action_input": action.tool_input,
+                    "thought": f"Direct {name} lookup for {city}",
+                    "action": name,
+                    "action_input": city,
                     "observation": observation
                 })
-                
-                # Create function call in the expected format
-                if action.tool in ["WeatherTool", "TimeTool", "CityFactsTool"]:
-                    # Extract city from the input
-                    city = action.tool_input
-                    function_calls.append({
-                        "tool": action.tool,
-                        "parameters": {"city": city}
-                    })
+        
+        return AgentResult(
+            output,
+            f"This only needs {', '.join(tool_names)} for {city}, so I called them directly.",
+            tool_calls=reasoning_steps,
+            function_calls=[{"tool": name, "parameters": {"city": city}} for name in tool_names]
+        )
+    
+    def prefetch_tools(self, user_input):
+        """Speculatively start the cached tool calls for a city named in the input.
+        
+        Call before running the agent, so the calls overlap its first thought.
+        If the agent then calls one of these tools for the city, it gets the
+        observation from the cache (or joins the call still in flight);
+        otherwise it stays cached for later questions. No-op when prefetch is off.
+        
+        Only known cities are prefetched: any capitalized word after "to" or
+        "about" ("Translate this to English") would otherwise cost API calls.
+        """
+        if not self.prefetch:
+            return
+        city = find_city(user_input)
+        if city is not None and is_known_city(city):
+            for tool in _PREFETCH_TOOLS:
+                _prefetch_pool.submit(tool.func, city)
+    
+    def _begin_turn(self, state, verbose_tools):
+        """Resolve the input and options of a turn and look it up in the response cache.
+        
+        Returns:
+            tuple: (user_input, verbose_tools, cache_context, cached result or None);
+                cache_context is None when the cache is disabled
+        """
+        user_input = state.get("input", "") if isinstance(state, dict) else state
+        if verbose_tools is None:
+            verbose_tools = os.getenv("TRIP_AGENT_VERBOSE_TOOLS") == "1"
+        
+        cache_context = None
+        if os.getenv("TRIP_AGENT_NOCACHE") != "1":
+            cache_context = (self._cache_namespace, verbose_tools, self._memory_key())
+            cached = _response_cache.get(cache_context, user_input)
+            if cached is not None:
+                self.memory.save_context({"input": user_input}, {"output": cached["response"]})
+                return user_input, verbose_tools, cache_context, copy.deepcopy(cached)
+        return user_input, verbose_tools, cache_context, None
+    
+    def _finish_turn(self, user_input, result, verbose_tools, cache_context):
+        """Turn the executor output into an AgentResult, save the turn and cache it."""
+        # Extract intermediate steps for transparency
+        intermediate_steps = result.get("intermediate_steps", [])
+        
+        # Extract the agent's thinking from the output
+        output = result.get("output", "I couldn't process your request.")
+        
+        # If the agent stopped due to iteration limit, build a better response
+        # by combining the tool observations
+        if output == "Agent stopped due to iteration limit or time limit.":
+            fallback_parts = dict.fromkeys(_TOOL_HANDLERS, "")
+            for action, observation in intermediate_steps:
+                formatter = _TOOL_HANDLERS.get(action.tool)
+                if formatter is not None and isinstance(observation, dict):
+                    fallback_parts[action.tool] = formatter(observation)
+            if any(fallback_parts.values()):
+                output = "\n\n".join(fallback_parts.values())
+        
+        # Extract the first thought from the agent's reasoning
+        thinking = _DEFAULT_THINKING
+        if intermediate_steps:
+            log = getattr(intermediate_steps[0][0], "log", None)
+            if log:
+                first_line = log.partition('\n')[0]
+                thinking = first_line.replace("Thought: ", "") if first_line.startswith("Thought:") else log
+        
+        # Save the conversation to memory - this will trigger summarization if needed
+        self.memory.save_context(
+            {"input": user_input},
+            {"output": output}
+        )
+        
+        # tool_calls and function_calls are built on first access
+        response = AgentResult(output, thinking, intermediate_steps, verbose_tools)
+        
+        if cache_context is not None:
+            _response_cache.put(cache_context, user_input, copy.deepcopy(response))
+        
+        return response
+    
+    def _error_result(self, user_input, e):
+        """Build the result for a failed turn, salvaging output from parsing errors."""
+        error_str = str(e)
+        
+        # Enhanced error handling; one scan covers all known error formats
+        extracted_content = extract_parse_error(error_str)
+        
+        if extracted_content:
+            # Separate the reasoning from the response
+            thinking, response = split_thinking(extracted_content)
             
-            return {
-                "response": output,
-                "tool_calls": reasoning_steps,
-                "reasoning": thinking,
-                "function_calls": function_calls
-            }
-        except Exception as e:
-            error_str = str(e)
+            # Clean up response content
+            response = response.strip()
+            if not response:
+                response = "I encountered a parsing error but was able to extract some content. Please try rephrasing your question."
             
-            # Enhanced error handling with multiple patterns
-            import re
-            patterns = [
-                r'Could not parse LLM output: `([\s\S]+?)`',
-                r'Stream error: "Could not parse LLM output: `([\s\S]+?)`',
-                r'OUTPUT_PARSING_FAILURE[\s\S]*?`([\s\S]+?)`'
-            ]
+            # Save to memory
+            try:
+                self.memory.save_context({"input": user_input}, {"output": response})
+            except Exception as save_error:
+                _log.exception("Error saving to memory: %s", save_error)
             
-            extracted_content = None
-            for pattern in patterns:
-                match = re.search(pattern, error_str)
-                if match:
-                    extracted_content = match.group(1)
-                    break
+            return AgentResult(
+                response,
+                thinking if thinking else "I've gathered information to answer your question.",
+                tool_calls=[],
+                function_calls=[]
+            )
+        
+        # For other types of errors
+        _log.exception("Error processing request: %s", e)
+        return AgentResult(
+            f"Error processing request: {error_str}",
+            f"Error occurred while processing: {user_input}",
+            tool_calls=[],
+            function_calls=[]
+        )
+    
+    def process_input(self, state, verbose_tools=None):
+        """Run the React agent on the user input and record the turn in memory.
+        
+        Args:
+            state: The user input, or a dict with an "input" key
+            verbose_tools (bool): Whether to build the per-step "tool_calls" list,
+                which copies every action log. Defaults to the
+                TRIP_AGENT_VERBOSE_TOOLS environment variable; when off,
+                "tool_calls" is returned empty and "function_calls" is still filled
+        
+        Returns:
+            AgentResult: The response, tool_calls, reasoning and function_calls;
+                on success the step lists are built on first access
+        """
+        user_input, verbose_tools, cache_context, cached = self._begin_turn(state, verbose_tools)
+        if cached is not None:
+            return cached
+        
+        try:
+            if self.fast_path:
+                fast_response = self._try_fast_path(user_input, verbose_tools)
+                if fast_response is not None:
+                    return fast_response
+            self.prefetch_tools(user_input)
             
-            if extracted_content:
-                # Enhanced thinking extraction with multiple patterns
-                thinking = ""
-                response = extracted_content
-                
-                # Try different thinking tag patterns
-                thinking_patterns = [
-                    r'<think>([\s\S]*?)</think>',
-                    r'<thinking>([\s\S]*?)</thinking>',
-                    r'Thought:([\s\S]*?)(?=Action:|Final Answer:|$)'
-                ]
-                
-                for think_pattern in thinking_patterns:
-                    thinking_match = re.search(think_pattern, extracted_content, re.IGNORECASE)
-                    if thinking_match:
-                        thinking = thinking_match.group(1).strip()
-                        # Remove thinking content from response
-                        response = re.sub(think_pattern, '', extracted_content, flags=re.IGNORECASE).strip()
-                        break
-                
-                # Clean up response content
-                response = response.strip()
-                if not response:
-                    response = "I encountered a parsing error but was able to extract some content. Please try rephrasing your question."
-                
-                # Save to memory
-                try:
-                    self.memory.save_context({"input": user_input}, {"output": response})
-                except Exception as save_error:
-                    print(f"Error saving to memory: {save_error}")
-                
-                return {
-                    "response": response,
-                    "tool_calls": [],
-                    "reasoning": thinking if thinking else "I've gathered information to answer your question.",
-                    "function_calls": []
-                }
+            # Construct enhanced input with proper context
+            enhanced_input = self.build_enhanced_input(user_input)
             
-            # For other types of errors
-            return {
-                "response": f"Error processing request: {error_str}",
-                "tool_calls": [],
-                "reasoning": f"Error occurred while processing: {user_input}"
-            }
+            # Use the React agent to process the enhanced input
+            result = self.agent_executor.invoke({"input": enhanced_input})
+            return self._finish_turn(user_input, result, verbose_tools, cache_context)
+        except Exception as e:
+            return self._error_result(user_input, e)
+    
+    async def aprocess_input(self, state, verbose_tools=None):
+        """Async process_input: the executor and LLM calls run on the event loop.
+        
+        Args:
+            state: The user input, or a dict with an "input" key
+            verbose_tools (bool): See process_input
+        
+        Returns:
+            AgentResult: The same result process_input returns
+        """
+        user_input, verbose_tools, cache_context, cached = self._begin_turn(state, verbose_tools)
+        if cached is not None:
+            return cached
+        
+        try:
+            if self.fast_path:
+                # The tools are synchronous HTTP calls; keep them off the event loop
+                fast_response = await asyncio.to_thread(self._try_fast_path, user_input, verbose_tools)
+                if fast_response is not None:
+                    return fast_response
+            self.prefetch_tools(user_input)
+            
+            enhanced_input = self.build_enhanced_input(user_input)
+            result = await self.agent_executor.ainvoke({"input": enhanced_input})
+            return self._finish_turn(user_input, result, verbose_tools, cache_context)
+        except Exception as e:
+            return self._error_result(user_input, e)
+    
+    async def process_batch(self, states, verbose_tools=None, max_concurrency=BATCH_CONCURRENCY_LIMIT):
+        """Process several inputs concurrently.
+        
+        The turns share this agent's memory, so each is recorded as it finishes;
+        use separate agents for independent conversations.
+        
+        Args:
+            states: The inputs, each a string or a dict with an "input" key
+            verbose_tools (bool): See process_input
+            max_concurrency (int): Maximum number of requests in flight, to stay
+                within the provider's rate limits
+        
+        Returns:
+            list: One AgentResult per input, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run(state):
+            async with semaphore:
+                return await self.aprocess_input(state, verbose_tools)
+        
+        return await asyncio.gather(*(run(state) for state in states))
+    
+    def process_input_stream(self, state):
+        """Run the React agent on the user input, yielding frames as it progresses.
+        
+        Intermediate agent chunks (planned actions, tool observations) are
+        yielded as soon as they are produced, so callers can forward them over
+        SSE instead of waiting for the whole run. The turn is saved to memory
+        once, with the final answer.
+        
+        Args:
+            state: The user input, or a dict with an "input" key
+            
+        Yields:
+            dict: {"partial": chunk} for each intermediate chunk, then a final
+                {"response": ..., "function_calls": [...]} frame, or
+                {"error": ...} if the agent failed
+        """
+        user_input = state.get("input", "") if isinstance(state, dict) else state
+        output = None
+        function_calls = []
+        
+        try:
+            self.prefetch_tools(user_input)
+            enhanced_input = self.build_enhanced_input(user_input)
+            for chunk in self.agent_executor.stream({"input": enhanced_input}):
+                if "output" in chunk:
+                    output = chunk["output"]
+                    continue
+                for step in chunk.get("steps", ()):
+                    if step.action.tool in _TOOL_HANDLERS:
+                        function_calls.append({
+                            "tool": step.action.tool,
+                            "parameters": {"city": _extract_city(step.action.tool_input)}
+                        })
+                yield {"partial": chunk}
+        except Exception as e:
+            yield {"error": f"Error processing request: {e}"}
+            return
+        
+        if output is None:
+            output = "I couldn't process your request."
+        self.memory.save_context({"input": user_input}, {"output": output})
+        yield {"response": output, "function_calls": function_calls}
     
     def execute_tools(self, state):
         # This method is kept for compatibility but not used with React agent
@@ -351,7 +884,7 @@ Combined summary:"""
         Args:
             max_tokens (int): Maximum number of tokens to keep in memory buffer
         """
-        self.memory.max_token_limit = max_tokens
+        self.max_token_limit = max_tokens
     
     def get_conversation_summary(self):
         """Get the current conversation summary and recent messages.
@@ -360,24 +893,15 @@ Combined summary:"""
             dict: Dictionary containing summary and recent messages
         """
         try:
-            # Load memory variables to get current state
-            memory_vars = self.memory.load_memory_variables({})
-            
-            # Get the moving summary buffer if it exists
-            summary = getattr(self.memory, 'moving_summary_buffer', '')
-            
-            # Get recent messages from chat memory
-            recent_messages = []
-            if hasattr(self.memory, 'chat_memory') and hasattr(self.memory.chat_memory, 'messages'):
-                recent_messages = self.memory.chat_memory.messages
-            
+            # Read the history directly; self.memory only wraps it
+            chat_history = self.chat_history
             return {
-                'summary': summary,
-                'recent_messages': recent_messages,
-                'history': memory_vars.get('history', '')
+                'summary': self.conversation_summary,
+                'recent_messages': chat_history.messages,
+                'history': chat_history.formatted()
             }
         except Exception as e:
-            print(f"Error getting conversation summary: {e}")
+            _log.exception("Error getting conversation summary: %s", e)
             return {
                 'summary': '',
                 'recent_messages': [],
@@ -391,13 +915,23 @@ Combined summary:"""
             str: The updated summary
         """
         try:
-            # Force a summary update by calling the memory's prune method
-            if hasattr(self.memory, 'prune'):
-                self.memory.prune()
+            with self._summary_lock:
+                with self._history_lock:
+                    messages = list(self.chat_history.messages)
+                    epoch = self._history_epoch
+                    summarized = self._last_summarized
+                    previous_summary = self.conversation_summary
+                
+                # Only messages added since the last update are sent to the summarizer
+                new_messages = messages[summarized:]
+                if new_messages:
+                    summary = self._predict_new_summary(new_messages, previous_summary)
+                    with self._history_lock:
+                        if epoch == self._history_epoch:
+                            self.conversation_summary = summary
+                            self._last_summarized = len(messages)
             
-            # Get the updated summary
-            summary = getattr(self.memory, 'moving_summary_buffer', '')
-            return summary
+            return self.conversation_summary
         except Exception as e:
-            print(f"Error updating summary: {e}")
-            return ''
\ No newline at end of file
+            _log.exception("Error updating summary: %s", e)
+            return ''
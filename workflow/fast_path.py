@@ -0,0 +1,128 @@
+"""Fast-path intent classifier for the agent.
+
+Simple questions such as "What's the weather in Paris?" map to exactly one
+tool call, and "Tell me about Paris" to a fixed set of tool calls, so they
+can be answered without a ReAct loop of LLM calls. Only whole-message
+matches count; anything else ("weather and time in Paris") goes to the agent.
+"""
+
+import re
+from typing import Any, Dict, Optional, Tuple
+
+_CITY = r"(?P<city>[A-Za-z][A-Za-z .'-]*?)"
+_TAIL = r"\s*(?:today|now|right now)?\s*[?.!]*\s*"
+
+# Tools used for a general "tell me about <city>" request
+CITY_OVERVIEW_TOOLS = ("CityFactsTool", "WeatherTool", "TimeTool")
+
+# Tools needed -> pattern matching a request that needs exactly those tools
+_INTENT_PATTERNS = {
+    ("WeatherTool",): re.compile(
+        rf"(?:(?:what|how)(?:'s| is)\s+)?(?:the\s+)?(?:current\s+)?weather\s+(?:like\s+)?in\s+{_CITY}{_TAIL}",
+        re.IGNORECASE
+    ),
+    ("TimeTool",): re.compile(
+        rf"(?:what(?:'s| is)?\s+)?(?:the\s+)?(?:current\s+|local\s+)*time\s+(?:is\s+it\s+)?in\s+{_CITY}{_TAIL}",
+        re.IGNORECASE
+    ),
+    CITY_OVERVIEW_TOOLS: re.compile(
+        rf"(?:(?:can you|please)\s+)?(?:what can you tell me|tell me|give me (?:some )?info(?:rmation)?)\s+about\s+{_CITY}\s*[?.!]*\s*",
+        re.IGNORECASE
+    ),
+}
+
+# Words that refer back to the conversation rather than name a city
+_REFERENCES = frozenset({"there", "here", "that city", "it"})
+
+# Pronouns, which "tell me about ..." often ends with instead of a place
+_PRONOUNS = frozenset({
+    "you", "yourself", "yourselves", "me", "myself", "him", "himself", "her", "herself",
+    "it", "itself", "us", "ourselves", "them", "themselves", "everything", "something",
+})
+
+# A capitalized place name after a preposition or travel verb, anywhere in a message
+_CITY_MENTION_RE = re.compile(
+    r"\b(?:in|about|to|for|from|visit(?:ing)?)\s+(?P<city>[A-Z][A-Za-z.'-]*(?:\s+[A-Z][A-Za-z.'-]*){0,2})"
+)
+
+# Words that mark a topic ("the history of Rome") rather than a bare city name
+_TOPIC_WORDS = frozenset({"a", "an", "and", "its", "my", "of", "that", "the", "this", "your"})
+
+# Words that mean the message asks more than the current state of one city:
+# comparisons ("Paris vs London") or another time ("Paris tomorrow")
+_NON_CITY_WORDS = frozenset({
+    "and", "or", "vs", "versus", "than", "compared", "plus", "with",
+    "tomorrow", "tonight", "yesterday", "next", "last", "later", "on", "at",
+    "morning", "afternoon", "evening", "night", "weekend", "week", "month", "year",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+})
+
+
+def classify(user_input: str) -> Optional[Tuple[Tuple[str, ...], str]]:
+    """Detect a request answered by a fixed set of tool calls.
+
+    Args:
+        user_input: The user's message
+
+    Returns:
+        (tool names, city) if the whole message is such a request, else None
+    """
+    text = user_input.strip()
+    for tool_names, pattern in _INTENT_PATTERNS.items():
+        match = pattern.fullmatch(text)
+        if match:
+            city = match.group("city").strip()
+            city_lower = city.lower()
+            words = {word.strip(".'-") for word in city_lower.split()}
+            if city_lower in _REFERENCES or not words.isdisjoint(_TOPIC_WORDS | _NON_CITY_WORDS | _PRONOUNS):
+                return None
+            # "Tell me about ..." takes any topic; only a capitalized name may be a city
+            if tool_names == CITY_OVERVIEW_TOOLS and not city[0].isupper():
+                return None
+            return tool_names, city
+    return None
+
+
+def usable_observations(observations: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the tool observations a fast-path answer may be built from.
+
+    Errors are dropped, and so is TimeTool's UTC fallback for an unknown city
+    (marked by a "note"), which would answer with the wrong local time. A city
+    overview is only answered once the name is known to be a place: TimeTool
+    resolved its timezone, or its Wikipedia page has coordinates. Otherwise
+    "Tell me about Python" would be answered as a city.
+
+    Args:
+        observations: Tool name -> observation
+
+    Returns:
+        The usable observations; empty if the agent should answer instead
+    """
+    usable = {
+        name: observation for name, observation in observations.items()
+        if isinstance(observation, dict) and "error" not in observation and "note" not in observation
+    }
+    if "CityFactsTool" in observations and "TimeTool" not in usable:
+        if not usable.get("CityFactsTool", {}).get("coordinates"):
+            return {}
+    return usable
+
+
+def find_city(user_input: str) -> Optional[str]:
+    """Find a city the message is likely about, for speculative tool calls.
+
+    Unlike classify this searches free text, so it only accepts capitalized
+    names following "in", "about", "to", "visit" and similar words.
+
+    Args:
+        user_input: The user's message
+
+    Returns:
+        The first such city name, or None
+    """
+    match = _CITY_MENTION_RE.search(user_input)
+    if match:
+        city = match.group("city").rstrip(".'-")
+        if city.lower() not in _REFERENCES:
+            return city
+    return None
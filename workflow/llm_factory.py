@@ -1,8 +1,16 @@
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
+import logging
 import os
-from typing import Optional, Dict, Any
+import threading
+from typing import TYPE_CHECKING, Optional, Dict, Any
+
+# Provider SDKs are imported by the method that needs them, so a deployment
+# only pays the import cost of the provider it uses
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langchain_groq import ChatGroq
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+_log = logging.getLogger(__name__)
 
 class LLMFactory:
     """Factory class for creating different LLM instances.
@@ -11,10 +19,18 @@ class LLMFactory:
     based on the provider and model name. It supports OpenAI, Groq, and Google models.
     """
     
+    # (provider, model_name, kwargs) -> client; a client owns its HTTP connection
+    # pool, so reusing it lets later calls skip the TCP/TLS handshake
+    _clients: Dict[Any, Any] = {}
+    _clients_lock = threading.Lock()
+    
     @staticmethod
     def create_llm(provider: str = "openai", model_name: Optional[str] = None, **kwargs) -> Any:
         """Create an LLM instance based on the provider and model name.
         
+        Clients are cached per configuration and shared by callers asking for
+        the same one. Configurations with unhashable arguments are not cached.
+        
         Args:
             provider: The LLM provider (openai, groq, google)
             model_name: The specific model name to use
@@ -28,6 +44,21 @@ class LLMFactory:
         """
         provider = provider.lower()
         
+        try:
+            key = (provider, model_name, frozenset(kwargs.items()))
+            hash(key)
+        except TypeError:
+            return LLMFactory._create_uncached(provider, model_name, **kwargs)
+        
+        with LLMFactory._clients_lock:
+            llm = LLMFactory._clients.get(key)
+            if llm is None:
+                llm = LLMFactory._clients[key] = LLMFactory._create_uncached(provider, model_name, **kwargs)
+        return llm
+    
+    @staticmethod
+    def _create_uncached(provider: str, model_name: Optional[str] = None, **kwargs) -> Any:
+        """Create a new LLM instance for a lowercased provider name."""
         if provider == "openai":
             return LLMFactory._create_openai_llm(model_name, **kwargs)
         elif provider == "groq":
@@ -38,8 +69,10 @@ class LLMFactory:
             raise ValueError(f"Unsupported LLM provider: {provider}")
     
     @staticmethod
-    def _create_openai_llm(model_name: Optional[str] = None, **kwargs) -> ChatOpenAI:
+    def _create_openai_llm(model_name: Optional[str] = None, **kwargs) -> "ChatOpenAI":
         """Create an OpenAI LLM instance."""
+        from langchain_openai import ChatOpenAI
+        
         default_model = "gpt-4o-mini"
         model = model_name or default_model
         
@@ -48,7 +81,7 @@ class LLMFactory:
         
         # Set default parameters if not provided
         temperature = kwargs.pop("temperature", 0.7)
-        print('OpenAI is being use')
+        _log.debug("Creating %s LLM: %s", "openai", model)
         return ChatOpenAI(
             model=model,
             temperature=temperature,
@@ -59,8 +92,10 @@ class LLMFactory:
         )
     
     @staticmethod
-    def _create_groq_llm(model_name: Optional[str] = None, **kwargs) -> ChatGroq:
+    def _create_groq_llm(model_name: Optional[str] = None, **kwargs) -> "ChatGroq":
         """Create a Groq LLM instance."""
+        from langchain_groq import ChatGroq
+        
         default_model = "deepseek-r1-distill-llama-70b"
         model = model_name or default_model
         
@@ -69,7 +104,7 @@ class LLMFactory:
         
         # Set default parameters if not provided
         temperature = kwargs.pop("temperature", 0.7)
-        print('deepseek is being use')
+        _log.debug("Creating %s LLM: %s", "groq", model)
         return ChatGroq(
             model=model,
             temperature=temperature,
@@ -78,8 +113,10 @@ class LLMFactory:
         )
     
     @staticmethod
-    def _create_google_llm(model_name: Optional[str] = None, **kwargs) -> ChatGoogleGenerativeAI:
+    def _create_google_llm(model_name: Optional[str] = None, **kwargs) -> "ChatGoogleGenerativeAI":
         """Create a Google LLM instance."""
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        
         default_model = "gemini-1.5-flash"
         model = model_name or default_model
         
@@ -88,7 +125,7 @@ class LLMFactory:
         
         # Set default parameters if not provided
         temperature = kwargs.pop("temperature", 0.7)
-        print('Google is being use')
+        _log.debug("Creating %s LLM: %s", "google", model)
         return ChatGoogleGenerativeAI(
             model=model,
             temperature=temperature,
@@ -0,0 +1,231 @@
+"""Chat history storage for the agent."""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+    _loads = orjson.loads
+else:
+    _dumps = json.dumps
+    _loads = json.loads
+
+# Transcript prefix per message class; the history only holds these two types
+_MESSAGE_PREFIXES = {HumanMessage: "Human: ", AIMessage: "AI: "}
+
+
+def format_messages(messages: Sequence[BaseMessage]) -> str:
+    """Format messages as a "Human: ..."/"AI: ..." transcript, one line per message."""
+    parts = []
+    append = parts.append
+    for msg in messages:
+        prefix = _MESSAGE_PREFIXES.get(type(msg))
+        if prefix is not None:
+            append(f"{prefix}{msg.content}\n")
+    return "".join(parts)
+
+
+def format_masked(messages: Sequence[BaseMessage]) -> str:
+    """Format messages like format_messages, with AI answers masked.
+
+    The user's questions carry most of the context at no summarization cost;
+    the answers are the bulk of the tokens.
+    """
+    parts = []
+    append = parts.append
+    for msg in messages:
+        msg_type = type(msg)
+        if msg_type is HumanMessage:
+            append(f"Human: {msg.content}\n")
+        elif msg_type is AIMessage:
+            append("AI: [answer omitted]\n")
+    return "".join(parts)
+
+
+def _message_dict(msg: BaseMessage) -> dict:
+    return {"type": "human" if type(msg) is HumanMessage else "ai", "content": msg.content}
+
+
+def message_dicts(messages: Sequence[BaseMessage]) -> List[dict]:
+    """Convert messages to {"type": "human"|"ai", "content": ...} dicts for the frontend.
+
+    Dispatches on the exact class with a single identity check per message.
+    """
+    return [_message_dict(msg) for msg in messages]
+
+
+class CachedChatHistory(BaseChatMessageHistory):
+    """In-memory chat history that caches its formatted transcript.
+
+    The transcript is rebuilt only after the history changes, so repeated
+    reads within a turn (building the prompt, reporting memory to the
+    frontend) cost O(1) instead of re-formatting every message. The frontend
+    dicts are kept in step with the messages, converting each message once.
+    """
+
+    def __init__(self):
+        self._messages: List[BaseMessage] = []
+        self._formatted: Optional[str] = None
+        self._dicts: List[dict] = []
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self._messages
+
+    def add_message(self, message: BaseMessage) -> None:
+        self._messages.append(message)
+        self._dicts.append(_message_dict(message))
+        self._formatted = None
+
+    def clear(self) -> None:
+        self._messages = []
+        self._dicts = []
+        self._formatted = None
+
+    def drop_oldest(self, count: int) -> None:
+        """Evict the `count` oldest messages in place."""
+        del self._messages[:count]
+        del self._dicts[:count]
+        self._formatted = None
+
+    def formatted(self) -> str:
+        """Return the transcript of the current messages."""
+        if self._formatted is None:
+            self._formatted = format_messages(self._messages)
+        return self._formatted
+
+    def message_dicts(self) -> List[dict]:
+        """Return the messages as frontend dicts; the list is shared, do not mutate it."""
+        return self._dicts
+
+
+class SQLiteChatHistory(BaseChatMessageHistory):
+    """Chat history persisted in SQLite, shared by workers and kept across restarts.
+
+    Messages are loaded lazily and cached until the history changes. Older
+    messages are summarized and deleted once the history exceeds its token
+    budget, so a session only holds the recent window and loading it stays
+    cheap. The conversation summary is stored per session next to the messages.
+
+    Args:
+        session_id (str): Key of the conversation in the database
+        path (str): Path of the SQLite database file
+    """
+
+    def __init__(self, session_id: str, path: str):
+        self.session_id = session_id
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._messages: Optional[List[BaseMessage]] = None
+        self._formatted: Optional[str] = None
+        self._dicts: Optional[List[dict]] = None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, message TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries (session_id TEXT PRIMARY KEY, summary TEXT NOT NULL)"
+            )
+
+    def _load_messages(self) -> List[BaseMessage]:
+        """Return the cached messages, reading them first if needed; call with the lock held."""
+        if self._messages is None:
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY id", (self.session_id,)
+            ).fetchall()
+            self._messages = messages_from_dict([_loads(row[0]) for row in rows])
+        return self._messages
+
+    # The caches are filled and updated under the same lock as the SQL
+    # statements, so a load racing an insert cannot cache a list without it
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            return self._load_messages()
+
+    def add_message(self, message: BaseMessage) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                (self.session_id, _dumps(message_to_dict(message)))
+            )
+            if self._messages is not None:
+                self._messages.append(message)
+            if self._dicts is not None:
+                self._dicts.append(_message_dict(message))
+            self._formatted = None
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (self.session_id,))
+            self._messages = []
+            self._dicts = []
+            self._formatted = None
+
+    def drop_oldest(self, count: int) -> None:
+        """Delete the `count` oldest messages of the session."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM messages WHERE id IN "
+                "(SELECT id FROM messages WHERE session_id = ? ORDER BY id LIMIT ?)",
+                (self.session_id, count)
+            )
+            if self._messages is not None:
+                del self._messages[:count]
+            if self._dicts is not None:
+                del self._dicts[:count]
+            self._formatted = None
+
+    def formatted(self) -> str:
+        """Return the transcript of the current messages."""
+        with self._lock:
+            if self._formatted is None:
+                self._formatted = format_messages(self._load_messages())
+            return self._formatted
+
+    def message_dicts(self) -> List[dict]:
+        """Return the messages as frontend dicts; the list is shared, do not mutate it."""
+        with self._lock:
+            if self._dicts is None:
+                self._dicts = message_dicts(self._load_messages())
+            return self._dicts
+
+    def load_summary(self) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE session_id = ?", (self.session_id,)
+            ).fetchone()
+        return row[0] if row else ""
+
+    def save_summary(self, summary: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (session_id, summary) VALUES (?, ?)",
+                (self.session_id, summary)
+            )
+
+
+def create_chat_history(session_id: str = "default") -> BaseChatMessageHistory:
+    """Create the chat history backend for a conversation.
+
+    Set TRIP_AGENT_HISTORY_DB to a SQLite file path to persist the history;
+    otherwise it is kept in memory.
+    """
+    path = os.getenv("TRIP_AGENT_HISTORY_DB")
+    if path:
+        return SQLiteChatHistory(session_id, path)
+    return CachedChatHistory()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
 
 
@@ -7,6 +7,8 @@ class FunctionCall(BaseModel):
     tool: str = Field(..., description="The name of the tool that was called")
     parameters: Dict[str, Any] = Field(..., description="The parameters passed to the tool")
 
+    model_config = ConfigDict(frozen=True)
+
 
 class AgentResponse(BaseModel):
     """Model for the agent's response including reasoning and function calls"""
@@ -14,8 +16,9 @@ class AgentResponse(BaseModel):
     function_calls: List[FunctionCall] = Field(default_factory=list, description="List of function calls made by the agent")
     response: str = Field(..., description="The final response to the user")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "thinking": "To help you plan your visit to Paris, I'll first get some facts, then fetch the current weather and time.",
                 "function_calls": [
@@ -25,4 +28,5 @@ class AgentResponse(BaseModel):
                 ],
                 "response": "Paris is the capital of France. It's currently 23°C and clear skies. The local time is 2:45 PM."
             }
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Precompiled patterns for parsing agent output, shared by the agent,
+the workflow and the streaming handler."""
+
+import re
+from typing import Optional, Tuple
+
+# Pulls the raw LLM output out of an output-parsing error in a single scan.
+# The 'Stream error: "Could not parse LLM output' form is covered by the first
+# alternative, which matches inside it with the same payload.
+ERROR_RE = re.compile(
+    r'Could not parse LLM output: `(?P<output>[\s\S]+?)`'
+    r'|OUTPUT_PARSING_FAILURE[\s\S]*?`(?P<failure>[\s\S]+?)`'
+)
+
+# Separates the model's reasoning (<think>, <thinking> or "Thought:") from its answer
+THINKING_RE = re.compile(
+    r'<(?P<tag>think(?:ing)?)>(?P<tagged>[\s\S]*?)</(?P=tag)>'
+    r'|Thought:(?P<thought>[\s\S]*?)(?=Action:|Final Answer:|$)',
+    re.IGNORECASE
+)
+
+# Opening and closing <think> tags in streamed tokens; split() keeps the tags
+THINK_TAG_RE = re.compile(r'(</?think>)')
+
+# The outermost {...} span on a line, for tool inputs passed as JSON
+JSON_OBJECT_RE = re.compile(r'\{.*\}')
+
+
+def extract_parse_error(error_str: str) -> Optional[str]:
+    """Return the raw LLM output embedded in a parsing error, or None."""
+    match = ERROR_RE.search(error_str)
+    if match:
+        return match.group("output") or match.group("failure")
+    return None
+
+
+def split_thinking(text: str) -> Tuple[str, str]:
+    """Split text into (thinking, remainder) using the first reasoning block.
+
+    Returns:
+        tuple: The stripped reasoning ("" if none) and the text with that block
+            removed, stripped
+    """
+    match = THINKING_RE.search(text)
+    if not match:
+        return "", text.strip()
+    tagged = match.group("tagged")
+    thinking = (tagged if tagged is not None else match.group("thought")).strip()
+    start, end = match.span()
+    return thinking, (text[:start] + text[end:]).strip()
+
+
+def partition_think(text: str) -> Optional[Tuple[str, str]]:
+    """Split text at its first <think>...</think> block.
+
+    Uses str.partition on the literal tags, which is much cheaper than a regex
+    search for text that is mostly streamed tokens without tags.
+
+    Returns:
+        tuple: (reasoning inside the block, text after the block), unstripped,
+            or None if the text has no complete, non-empty block
+    """
+    _, opening, rest = text.partition("<think>")
+    if not opening:
+        return None
+    thinking, closing, after = rest.partition("</think>")
+    if not closing or not thinking:
+        return None
+    return thinking, after
@@ -0,0 +1,59 @@
+"""Optional prompt compression for the conversation history.
+
+Long histories are compressed with LLMLingua before they are sent to the
+agent. Compression is opt-in (TRIP_AGENT_COMPRESS_PROMPT=1) because the
+compressor loads a local model; without the llmlingua package, or below
+the length threshold, the text is returned unchanged.
+"""
+
+import logging
+import os
+import threading
+
+try:
+    from llmlingua import PromptCompressor
+except ImportError:
+    PromptCompressor = None
+
+# Histories shorter than this (in characters) are not worth compressing
+COMPRESSION_THRESHOLD = 2000
+# Fraction of the tokens LLMLingua keeps
+COMPRESSION_RATE = 0.4
+
+_log = logging.getLogger(__name__)
+
+_compressor = None
+_compressor_lock = threading.Lock()
+
+
+def _get_compressor():
+    """Create the shared PromptCompressor on first use."""
+    global _compressor
+    if _compressor is None:
+        with _compressor_lock:
+            if _compressor is None:
+                _compressor = PromptCompressor()
+    return _compressor
+
+
+def compression_enabled():
+    return PromptCompressor is not None and os.getenv("TRIP_AGENT_COMPRESS_PROMPT") == "1"
+
+
+def compress_context(text):
+    """Compress a conversation transcript, or return it unchanged.
+
+    Args:
+        text (str): The transcript to compress
+
+    Returns:
+        str: The compressed transcript, or `text` when compression is disabled,
+            unavailable, fails, or `text` is below COMPRESSION_THRESHOLD
+    """
+    if len(text) < COMPRESSION_THRESHOLD or not compression_enabled():
+        return text
+    try:
+        return _get_compressor().compress_prompt(text, rate=COMPRESSION_RATE)["compressed_prompt"]
+    except Exception as e:
+        _log.warning("Error compressing prompt: %s", e)
+        return text
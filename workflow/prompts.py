@@ -1,5 +1,9 @@
+from functools import lru_cache
+
+
 class Prompts:
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_react_prompt():
         return """
 You are a helpful assistant with access to tools. Use the following tools to answer questions about cities, weather, and local time:
@@ -8,7 +12,7 @@ You are a helpful assistant with access to tools. Use the following tools to ans
 
 When a user asks about a city, you should use all available tools to provide comprehensive information about:
 1. Facts about the city using CityFactsTool
-2. Current weather in the city using WeatherTool
+2. Current weather in the city using WeatherTool (WeatherBatchTool when comparing several cities)
 3. Local time in the city using TimeTool
 
 Use the following format:
@@ -16,7 +20,7 @@ Use the following format:
 Question: the input question you must answer
 Thought: you should always think about what to do
 Action: the action to take, should be one of [{tool_names}]
-Action Input: the input to the action (just the city name)
+Action Input: the input to the action (just the city name; for WeatherBatchTool, a comma-separated list of city names)
 Observation: the result of the action
 ... (this Thought/Action/Action Input/Observation can repeat N times)
 Thought: I now know the final answer
@@ -29,6 +33,25 @@ Begin!
 Question: {input}
 Thought: {agent_scratchpad}"""
 
+    @staticmethod
+    def get_summary_prompt():
+        return """Merge the previous summary with the new conversation turns into a single concise summary.
+
+Previous summary: {summary}
+
+New turns:
+{conversation}
+
+Merged summary:"""
+
+    @staticmethod
+    def get_city_overview_prompt():
+        return """You are a helpful travel assistant. Using only the information below, write a short, friendly overview of {city} for a traveler: what the city is known for, the current weather and the local time.
+
+{observations}
+
+Overview:"""
+
     # Keeping the original prompts for backward compatibility
     @staticmethod
     def get_system_prompt():
@@ -0,0 +1,81 @@
+"""Response cache for the agent.
+
+Entries are scoped by a context key (LLM configuration and conversation state)
+and matched on the normalized user input, so rephrasings such as
+"weather in Tokyo?" and "what's the weather in Tokyo" share one entry. Word
+order and negations are kept: "Is London warmer than Paris" and "Is Paris
+warmer than London" are different questions. Entries expire after a TTL
+because tool results such as weather go stale.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that do not change what is being asked; negations and words giving a
+# direction ("to", "from") are deliberately kept
+_STOPWORDS = frozenset({
+    "a", "about", "an", "are", "can", "could", "do", "does",
+    "give", "how", "i", "in", "is", "it", "like", "me", "now", "of", "please",
+    "right", "s", "show", "tell", "the", "there", "what", "whats", "you",
+})
+
+
+def normalize_query(text):
+    """Reduce a query to the words that carry its meaning, in order."""
+    return tuple(word for word in _WORD_PATTERN.findall(text.lower()) if word not in _STOPWORDS)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with TTL, keyed on the normalized query.
+
+    Args:
+        maxsize (int): Maximum number of entries kept
+        ttl (float): Seconds an entry stays valid
+    """
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (context, terms) -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, context, query):
+        """Return the cached value for the same query in the same context, or None."""
+        terms = normalize_query(query)
+        if not terms:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            key = (context, terms)
+            if key not in self._entries:
+                return None
+
+            expires_at, value = self._entries[key]
+            if expires_at < now:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, context, query, value):
+        """Store `value` for `query` in `context`, evicting the least recently used entry."""
+        terms = normalize_query(query)
+        if not terms:
+            return
+
+        with self._lock:
+            key = (context, terms)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -2,8 +2,35 @@ from langchain_core.callbacks.base import BaseCallbackHandler
 from typing import Any, Dict, List, Optional, Union
 import asyncio
 import json
-import re
-from langchain_core.messages import HumanMessage, AIMessage
+import logging
+from collections import deque
+
+from .patterns import JSON_OBJECT_RE, THINK_TAG_RE, extract_parse_error, split_thinking
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+_log = logging.getLogger(__name__)
+
+# Seconds over which response tokens are coalesced into one structured_update;
+# the final state always follows in structured_output
+STRUCTURED_UPDATE_INTERVAL = 0.05
+# Items the consumer may fall behind by before token callbacks wait for it
+STREAM_BUFFER_LIMIT = 256
+
+# Tool separator events, shared by all handlers; consumers must not modify them
+_TOOL_END_EVENT = {"type": "tool_separator", "content": "\n---Tool Complete---\n"}
+_tool_start_events = {}  # tool name -> event
+
+
+def _tool_start_event(tool_name):
+    event = _tool_start_events.get(tool_name)
+    if event is None:
+        event = _tool_start_events[tool_name] = {"type": "tool_separator", "content": f"\n---Using {tool_name}---\n"}
+    return event
+
 
 class StreamingHandler(BaseCallbackHandler):
     """Callback handler for streaming tokens and agent steps.
@@ -14,59 +41,93 @@ class StreamingHandler(BaseCallbackHandler):
     
     def __init__(self, agent=None):
         self.tokens = []
-        self.queue = asyncio.Queue()
+        # Pending stream items; aiter drains everything buffered per wakeup
+        self.buffer = deque()
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()  # Set each time the consumer empties the buffer
+        self._consuming = False  # Backpressure applies only once a consumer is attached
         self.current_section = "thinking"  # thinking, tool, response
         self.function_calls = []
-        self.thinking_buffer = ""
-        self.response_buffer = ""
+        # Streamed text is collected as parts and joined only when it is sent
+        self._thinking_parts = []
+        self._response_parts = []
+        self._dirty = False  # Response changed since the last structured_update
+        self._thinking_text = (0, "")  # (part count, stripped text) of the last update's thinking
+        self._flusher = None  # Task sending the pending structured_update
         self.agent = agent  # Store reference to the agent
         
+    def _emit(self, item):
+        """Buffer an item for aiter and wake it up."""
+        self.buffer.append(item)
+        self._ready.set()
+
     async def on_llm_start(self, *args, **kwargs):
         """Run when LLM starts generating."""
         self.current_section = "thinking"
     
     async def on_llm_new_token(self, token: str, **kwargs):
         """Run on new LLM token with structured output parsing."""
-        # Check for <think> tags to separate reasoning from response
-        if "<think>" in token or "</think>" in token:
-            # Handle thinking tag transitions
-            if "<think>" in token:
-                self.current_section = "thinking"
-                # Remove the <think> tag from the token
-                token = token.replace("<think>", "")
-            elif "</think>" in token:
-                self.current_section = "response"
-                # Remove the </think> tag and any content before it
-                parts = token.split("</think>")
-                if len(parts) > 1:
-                    # Add the thinking part to thinking buffer
-                    if parts[0]:
-                        self.thinking_buffer += parts[0]
-                        await self.queue.put({"type": "thinking", "content": self._escape_special_chars(parts[0])})
-                    # Continue with the response part
-                    token = parts[1]
-                else:
-                    token = ""
+        # One scan splits the token into text segments and the <think> tags
+        # between them: [text, tag, text, tag, text, ...]
+        for index, part in enumerate(THINK_TAG_RE.split(token)):
+            if index % 2:
+                # A tag switches between reasoning and response
+                self.current_section = "thinking" if part == "<think>" else "response"
+            elif part:
+                self._add_text(part)
         
-        if self.current_section == "thinking" and token:
+        # Let a slow consumer catch up instead of buffering without bound
+        if self._consuming and len(self.buffer) >= STREAM_BUFFER_LIMIT:
+            self._drained.clear()
+            await self._drained.wait()
+    
+    def _add_text(self, token):
+        """Buffer and stream a tag-free text segment in the current section."""
+        if self.current_section == "thinking":
             # Accumulate thinking tokens and stream them
-            self.thinking_buffer += token
-            await self.queue.put({"type": "thinking", "content": self._escape_special_chars(token)})
-        elif self.current_section == "response" and token:
+            self._thinking_parts.append(token)
+            self._emit({"type": "thinking", "content": token})
+        elif self.current_section == "response":
             # Accumulate response tokens and stream them
-            self.response_buffer += token
-            await self.queue.put({"type": "token", "content": self._escape_special_chars(token)})
+            self._response_parts.append(token)
+            self._emit({"type": "token", "content": token})
             
-            # Also send a structured update with the updated response
-            structured_update = {
+            # Also send a structured update with the updated response; tokens
+            # arriving within STRUCTURED_UPDATE_INTERVAL share one update.
+            # Whitespace alone leaves the stripped snapshot unchanged.
+            if token.isspace():
+                return
+            self._dirty = True
+            if self._flusher is None:
+                self._flusher = asyncio.get_running_loop().create_task(self._flush_update())
+    
+    async def _flush_update(self):
+        """Send one structured_update for the tokens of the last interval."""
+        await asyncio.sleep(STRUCTURED_UPDATE_INTERVAL)
+        self._flusher = None
+        if self._dirty:
+            self._dirty = False
+            # The reasoning rarely changes once the response streams; rebuild
+            # its text only when parts were added since the last update
+            count, thinking = self._thinking_text
+            if count != len(self._thinking_parts):
+                thinking = "".join(self._thinking_parts).strip()
+                self._thinking_text = (len(self._thinking_parts), thinking)
+            self._emit({
                 "type": "structured_update",
                 "content": {
-                    "thinking": self.thinking_buffer.strip(),
+                    "thinking": thinking,
                     "function_calls": self.function_calls,
-                    "response": self.response_buffer.strip()
+                    "response": "".join(self._response_parts).strip()
                 }
-            }
-            await self.queue.put(structured_update)
+            })
+    
+    def _cancel_update(self):
+        """Drop the pending structured_update; a full structured_output supersedes it."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        self._dirty = False
     
     async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs):
         """Run when a tool starts being used."""
@@ -79,11 +140,16 @@ class StreamingHandler(BaseCallbackHandler):
             # Try to extract parameters from the input string
             if '{' in input_str and '}' in input_str:
                 try:
-                    # Try to parse as JSON if it looks like a JSON object
-                    json_str = re.search(r'\{.*\}', input_str)
-                    if json_str:
-                        params = json.loads(json_str.group(0))
-                except json.JSONDecodeError:
+                    # Try to parse as JSON if it looks like a JSON object. Usually the
+                    # whole input is the object; search for one only otherwise
+                    stripped = input_str.strip()
+                    if stripped.startswith('{') and stripped.endswith('}'):
+                        params = json_loads(stripped)
+                    else:
+                        json_str = JSON_OBJECT_RE.search(input_str)
+                        if json_str:
+                            params = json_loads(json_str.group(0))
+                except ValueError:
                     # If JSON parsing fails, use a simple key-value approach
                     params = {"input": input_str}
             else:
@@ -98,200 +164,163 @@ class StreamingHandler(BaseCallbackHandler):
         })
         
         # Stream the tool separator
-        await self.queue.put({"type": "tool_separator", "content": f"\n---Using {tool_name}---\n"})
+        self._emit(_tool_start_event(tool_name))
     
     async def on_tool_end(self, output: str, **kwargs):
         """Run when a tool finishes being used."""
         self.current_section = "thinking"
-        await self.queue.put({"type": "tool_separator", "content": "\n---Tool Complete---\n"})
+        self._emit(_TOOL_END_EVENT)
     
     async def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], **kwargs):
         """Run when chain starts running."""
         pass
     
-    async def on_chain_end(self, outputs: Dict[str, Any], **kwargs):
-        """Run when chain ends running."""
-        # Set the current section to response before creating the structured output
-        self.current_section = "response"
-        
-        # Extract the final answer from the outputs if available
-        final_answer = ""
-        if outputs and isinstance(outputs, dict) and "output" in outputs:
-            final_answer = outputs["output"]
-            # Store the final answer in the response buffer
-            self.response_buffer = final_answer
-            
-            # Get the last message from the conversation history
-            from langchain_core.messages import AIMessage
-            if hasattr(self, 'agent') and hasattr(self.agent, 'memory') and hasattr(self.agent.memory, 'chat_memory'):
-                self.agent.memory.chat_memory.add_message(AIMessage(content=final_answer))
+    def _load_conversation(self):
+        """Read the conversation summary and history from the agent's memory for the frontend.
         
-        # Get conversation summary and history from memory for frontend
+        Returns:
+            tuple: (conversation_summary, conversation_history)
+        """
         conversation_summary = ""
         conversation_history = []
-        if hasattr(self, 'agent') and hasattr(self.agent, 'memory'):
+        memory = getattr(self.agent, 'memory', None)
+        if memory is not None:
             try:
                 # Load memory variables to get summary and history
-                memory_vars = self.agent.memory.load_memory_variables({})
-                
-                # Extract summary if available (ConversationSummaryBufferMemory provides this)
-                if 'history' in memory_vars:
-                    if isinstance(memory_vars['history'], str):
-                        conversation_summary = memory_vars['history']
-                    elif isinstance(memory_vars['history'], list):
-                        # Convert message list to readable format
-                        for msg in memory_vars['history']:
-                            if hasattr(msg, 'content'):
-                                msg_type = "human" if hasattr(msg, 'type') and msg.type == "human" else "ai"
-                                conversation_history.append({
-                                    "type": msg_type,
-                                    "content": msg.content
-                                })
+                history = memory.load_memory_variables({}).get('history')
+                if isinstance(history, str):
+                    conversation_summary = history
+                elif isinstance(history, list):
+                    # Convert message list to readable format
+                    conversation_history = [
+                        {"type": "human" if getattr(msg, 'type', None) == "human" else "ai", "content": msg.content}
+                        for msg in history if hasattr(msg, 'content')
+                    ]
                 
-                # Get the moving summary if it exists (for ConversationSummaryBufferMemory)
-                if hasattr(self.agent.memory, 'moving_summary_buffer') and self.agent.memory.moving_summary_buffer:
-                    conversation_summary = self.agent.memory.moving_summary_buffer
+                # The moving summary takes precedence (ConversationSummaryBufferMemory)
+                moving_summary = getattr(memory, 'moving_summary_buffer', '')
+                if moving_summary:
+                    conversation_summary = moving_summary
                     
             except Exception as e:
-                print(f"Error loading memory variables: {e}")
-        
-        # When the chain ends, we can send the structured format with memory info
-        structured_output = {
+                _log.warning("Error loading memory variables: %s", e)
+        return conversation_summary, conversation_history
+    
+    def _structured_output(self, thinking, response):
+        """Build the structured_output event, with the conversation from memory."""
+        conversation_summary, conversation_history = self._load_conversation()
+        return {
             "type": "structured_output",
             "content": {
-                "thinking": self.thinking_buffer.strip(),
+                "thinking": thinking,
                 "function_calls": self.function_calls,
-                "response": self.response_buffer.strip(),
+                "response": response,
                 "conversation_summary": conversation_summary,
                 "conversation_history": conversation_history
             }
         }
+    
+    async def on_chain_end(self, outputs: Dict[str, Any], **kwargs):
+        """Run when chain ends running."""
+        # Set the current section to response before creating the structured output
+        self.current_section = "response"
+        self._cancel_update()
+        
+        # Extract the final answer from the outputs if available
+        final_answer = ""
+        if outputs and isinstance(outputs, dict) and "output" in outputs:
+            final_answer = outputs["output"]
+            # Store the final answer in the response buffer; the caller records
+            # the turn in memory via save_context, so it is not added here
+            self._response_parts = [final_answer]
         
-        await self.queue.put(structured_output)
+        # When the chain ends, we can send the structured format with memory info
+        self._emit(self._structured_output(
+            "".join(self._thinking_parts).strip(),
+            "".join(self._response_parts).strip()
+        ))
         
     async def on_chain_error(self, error: Union[Exception, KeyboardInterrupt], **kwargs):
         """Run when chain errors with enhanced parsing."""
         error_str = str(error)
-        await self.queue.put({"type": "error", "content": self._escape_special_chars(error_str)})
+        self._emit({"type": "error", "content": error_str})
         
         # Enhanced error patterns matching frontend implementation
-        import re
-        patterns = [
-            r'Could not parse LLM output: `([\s\S]+?)`',
-            r'Stream error: "Could not parse LLM output: `([\s\S]+?)`',
-            r'OUTPUT_PARSING_FAILURE[\s\S]*?`([\s\S]+?)`'
-        ]
-        
-        extracted_content = None
-        for pattern in patterns:
-            match = re.search(pattern, error_str)
-            if match:
-                extracted_content = match.group(1)
-                break
+        extracted_content = extract_parse_error(error_str)
         
         if extracted_content:
-            # Enhanced thinking extraction with multiple patterns
-            thinking_content = ""
-            response_content = extracted_content
-            
-            # Try different thinking tag patterns
-            thinking_patterns = [
-                r'<think>([\s\S]*?)</think>',
-                r'<thinking>([\s\S]*?)</thinking>',
-                r'Thought:([\s\S]*?)(?=Action:|Final Answer:|$)'
-            ]
-            
-            for think_pattern in thinking_patterns:
-                thinking_match = re.search(think_pattern, extracted_content, re.IGNORECASE)
-                if thinking_match:
-                    thinking_content = thinking_match.group(1).strip()
-                    # Remove thinking content from response
-                    response_content = re.sub(think_pattern, '', extracted_content, flags=re.IGNORECASE).strip()
-                    break
+            # Separate the reasoning from the response
+            thinking_content, response_content = split_thinking(extracted_content)
             
             # Clean up response content
             response_content = response_content.strip()
             if not response_content:
                 response_content = "I encountered a parsing error but was able to extract some content. Please try rephrasing your question."
             
-            # Update buffers
-            self.thinking_buffer = thinking_content
-            self.response_buffer = response_content
-            
-            # Get conversation summary and history from memory for error case
-            conversation_summary = ""
-            conversation_history = []
-            if hasattr(self, 'agent') and hasattr(self.agent, 'memory'):
-                try:
-                    # Load memory variables to get summary and history
-                    memory_vars = self.agent.memory.load_memory_variables({})
-                    
-                    # Extract summary if available (ConversationSummaryBufferMemory provides this)
-                    if 'history' in memory_vars:
-                        if isinstance(memory_vars['history'], str):
-                            conversation_summary = memory_vars['history']
-                        elif isinstance(memory_vars['history'], list):
-                            # Convert message list to readable format
-                            for msg in memory_vars['history']:
-                                if hasattr(msg, 'content'):
-                                    msg_type = "human" if hasattr(msg, 'type') and msg.type == "human" else "ai"
-                                    conversation_history.append({
-                                        "type": msg_type,
-                                        "content": msg.content
-                                    })
-                    
-                    # Get the moving summary if it exists (for ConversationSummaryBufferMemory)
-                    if hasattr(self.agent.memory, 'moving_summary_buffer') and self.agent.memory.moving_summary_buffer:
-                        conversation_summary = self.agent.memory.moving_summary_buffer
-                        
-                except Exception as e:
-                    print(f"Error loading memory variables in error handler: {e}")
+            # Update buffers; the structured output below supersedes any pending update
+            self._cancel_update()
+            self._thinking_parts = [thinking_content]
+            self._thinking_text = (0, "")
+            self._response_parts = [response_content]
             
             # Send the extracted content as a structured output
-            structured_output = {
-                "type": "structured_output",
-                "content": {
-                    "thinking": thinking_content,
-                    "function_calls": self.function_calls,
-                    "response": response_content,
-                    "conversation_summary": conversation_summary,
-                    "conversation_history": conversation_history
-                }
-            }
-            await self.queue.put(structured_output)
+            self._emit(self._structured_output(thinking_content, response_content))
             
             # Also send the content as a token to ensure it's displayed
-            await self.queue.put({"type": "token", "content": self._escape_special_chars(response_content)})
+            self._emit({"type": "token", "content": response_content})
     
-    def _escape_special_chars(self, text):
-        """Escape special characters for JSON."""
-        if not isinstance(text, str):
-            return text
-        return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+    def close(self):
+        """End the stream: aiter stops once it has yielded everything buffered."""
+        self._cancel_update()
+        self._emit(None)
     
-    async def aiter(self):
-        """Async iterator for getting tokens and updates."""
-        while True:
-            try:
-                # Get the next token from the queue
-                token_data = await self.queue.get()
-                
-                # Yield the token data
-                yield token_data
-                self.queue.task_done()
-            except asyncio.CancelledError:
-                break
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    # Event loop is closed, stop iteration gracefully
+    async def abatches(self):
+        """Async iterator over lists of tokens and updates, until close() is called.
+        
+        Each list holds everything buffered since the previous one, so a burst
+        of tokens costs one await and can be written downstream in one go.
+        """
+        self._consuming = True
+        try:
+            while True:
+                try:
+                    # Clearing before draining means an item emitted mid-drain re-arms the event
+                    await self._ready.wait()
+                    self._ready.clear()
+                    batch = list(self.buffer)
+                    self.buffer.clear()
+                    self._drained.set()
+                    if None in batch:
+                        # close() was called; deliver what came before it and stop
+                        batch = batch[:batch.index(None)]
+                        if batch:
+                            yield batch
+                        return
+                    if batch:
+                        yield batch
+                except asyncio.CancelledError:
                     break
-                else:
-                    # Re-raise other RuntimeErrors
-                    raise
-            except Exception as e:
-                # Log other exceptions and break to prevent infinite loops
-                print(f"Error in streaming handler aiter: {e}")
-                break
+                except RuntimeError as e:
+                    if "Event loop is closed" in str(e):
+                        # Event loop is closed, stop iteration gracefully
+                        break
+                    else:
+                        # Re-raise other RuntimeErrors
+                        raise
+                except Exception as e:
+                    # Log other exceptions and break to prevent infinite loops
+                    _log.warning("Error in streaming handler aiter: %s", e)
+                    break
+        finally:
+            # Never leave a producer waiting on a consumer that has gone
+            self._consuming = False
+            self._drained.set()
+    
+    async def aiter(self):
+        """Async iterator for getting tokens and updates one at a time, until close() is called."""
+        async for batch in self.abatches():
+            for item in batch:
+                yield item
 
 def get_streaming_handler(agent=None):
     """Create and return a new StreamingHandler instance.
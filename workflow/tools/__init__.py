@@ -6,20 +6,44 @@ This tool potential to convert to a MCP call
 from langchain.agents import Tool
 
 # Import the tools from the individual tool files
-from .weather_tool import get_weather, WeatherTool
-from .time_tool import get_time, TimeTool
+from .weather_tool import get_weather, get_weather_batch, WeatherTool, CACHE_TTL as WEATHER_CACHE_TTL, _fetch_weather
+from .time_tool import get_time, is_known_city, TimeTool
 from .city_facts_tool import get_city_facts, CityFactsTool
+from .observation_cache import ObservationCache
+
+# Seconds tool observations are reused; the time tool is not cached and the
+# weather tool caches its own lookups (for WEATHER_CACHE_TTL seconds)
+CITY_FACTS_CACHE_TTL = 3600
 
 # Create tool instances using the imported classes
 weather_tool = WeatherTool()
 time_tool = TimeTool()
 city_facts_tool = CityFactsTool()
 
+def _weather(city):
+    """Look up one city's weather; the lookup itself is cached per location."""
+    return get_weather(city)
+
+# Expose the lookup's cache so the agent treats this tool as cached (and
+# prefetches it) without stacking a second cache on top
+_weather.cache = _fetch_weather.cache
+
 # Define tools as Tool instances for the agent
 weather_tool_for_agent = Tool(
     name="WeatherTool",
     description="Get weather information for a specific city. Input should be a city name.",
-    func=lambda city: get_weather(city)
+    func=_weather
+)
+
+def _weather_batch(cities):
+    """Look up a comma-separated list of cities; returns {city: weather dict}."""
+    names = [city.strip().strip('"\'') for city in cities.split(",") if city.strip()]
+    return dict(zip(names, get_weather_batch.invoke({"cities": names})))
+
+weather_batch_tool_for_agent = Tool(
+    name="WeatherBatchTool",
+    description="Get weather information for several cities in one call. Input should be a comma-separated list of city names.",
+    func=_weather_batch
 )
 
 time_tool_for_agent = Tool(
@@ -28,11 +52,16 @@ time_tool_for_agent = Tool(
     func=lambda city: get_time(city)
 )
 
+@ObservationCache(ttl=CITY_FACTS_CACHE_TTL)
+def _city_facts(city):
+    """Look up facts about one city, reusing the last lookup for CITY_FACTS_CACHE_TTL seconds."""
+    return get_city_facts(city)
+
 city_facts_tool_for_agent = Tool(
     name="CityFactsTool",
     description="Get interesting facts and information about a city. Input should be a city name.",
-    func=lambda city: get_city_facts(city)
+    func=_city_facts
 )
 
 # List of tools available to the agent
-tools = [weather_tool_for_agent, time_tool_for_agent, city_facts_tool_for_agent]
\ No newline at end of file
+tools = [weather_tool_for_agent, weather_batch_tool_for_agent, time_tool_for_agent, city_facts_tool_for_agent]
\ No newline at end of file
@@ -5,11 +5,22 @@ This tool potential to convert to a MCP call
 This module provides a tool to get facts about cities using the Wikipedia API.
 """
 
-import wikipediaapi
+import asyncio
+import requests
 from typing import Dict, Any, Optional, Type, List
 from pydantic import BaseModel, Field
 from langchain.tools import BaseTool, tool
 
+_WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+
+# Length of the summary and number of categories returned per city
+SUMMARY_CHARS = 1500
+CATEGORY_LIMIT = 5
+
+# One pooled session for all lookups, so repeated calls reuse the connection
+_session = requests.Session()
+_session.headers["User-Agent"] = "SalesMakerAgent/1.0 (david@example.com)"
+
 class CityFactsInput(BaseModel):
     """Input for the city facts tool."""
     city: str = Field(..., description="The city to get facts about")
@@ -20,35 +31,63 @@ class CityFactsTool(BaseTool):
     name: str = "city_facts"
     description: str = "Useful for getting facts about a specific city. Input should be a city name."
     args_schema: Type[BaseModel] = CityFactsInput
-    wiki: Any = None
     
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.wiki = wikipediaapi.Wikipedia('SalesMakerAgent/1.0 (david@example.com)', 'en')
+    @staticmethod
+    def _fetch_page(title: str) -> Optional[Dict[str, Any]]:
+        """Fetch a page's intro, URL, coordinates and first categories in a single API request.
+        
+        The intro is truncated to SUMMARY_CHARS and the categories to
+        CATEGORY_LIMIT by the API, so only what is kept is downloaded.
+        
+        Returns:
+            The page record, or None if the page does not exist
+        """
+        response = _session.get(_WIKIPEDIA_API_URL, params={
+            "action": "query",
+            "format": "json",
+            "formatversion": 2,
+            "redirects": 1,
+            "titles": title,
+            "prop": "extracts|categories|info|coordinates",
+            "exintro": 1,
+            "explaintext": 1,
+            "exchars": SUMMARY_CHARS,
+            "inprop": "url",
+            "cllimit": CATEGORY_LIMIT
+        }, timeout=10)
+        response.raise_for_status()
+        pages = response.json().get("query", {}).get("pages", [])
+        if not pages or pages[0].get("missing") or pages[0].get("invalid"):
+            return None
+        return pages[0]
     
     def _run(self, city: str) -> Dict[str, Any]:
         """Run the city facts tool."""
         try:
             # Search for the city page
-            page = self.wiki.page(f"{city}")
+            page = self._fetch_page(f"{city}")
             
             # If page doesn't exist, try with 'city'
-            if not page.exists():
-                page = self.wiki.page(f"{city} city")
+            if page is None:
+                page = self._fetch_page(f"{city} city")
             
             # If still doesn't exist, return error
-            if not page.exists():
+            if page is None:
                 return {"error": f"Could not find Wikipedia page for {city}"}
             
-            # Get the summary (first section)
-            summary = page.summary[0:1500]  # Limit to 1500 chars
+            # Get the summary (first section); exchars may overshoot to end a sentence
+            summary = page.get("extract", "")[0:SUMMARY_CHARS]
+            
+            # Primary coordinates, present only for pages about a place
+            coordinates = page.get("coordinates", [])
             
             # Format the city facts
             city_facts = {
-                "title": page.title,
+                "title": page["title"],
                 "summary": summary,
-                "url": page.fullurl,
-                "categories": list(page.categories.keys())[0:5] if page.categories else []  # First 5 categories
+                "url": page.get("fullurl", ""),
+                "categories": [category["title"] for category in page.get("categories", [])],
+                "coordinates": {"lat": coordinates[0]["lat"], "lon": coordinates[0]["lon"]} if coordinates else None
             }
             
             return city_facts
@@ -57,8 +96,12 @@ class CityFactsTool(BaseTool):
     
     async def _arun(self, city: str) -> Dict[str, Any]:
         """Run the city facts tool asynchronously."""
-        # For simplicity, we're using the synchronous version
-        return self._run(city)
+        # The lookup is blocking HTTP; keep it off the event loop
+        return await asyncio.to_thread(self._run, city)
+
+
+# Shared by get_city_facts calls; the tool holds no per-call state
+_city_facts_tool = CityFactsTool()
 
 
 @tool
@@ -71,8 +114,7 @@ def get_city_facts(city: str) -> Dict[str, Any]:
     Returns:
         Dict containing city information
     """
-    city_facts_tool = CityFactsTool()
-    return city_facts_tool.invoke({"city": city})
+    return _city_facts_tool.invoke({"city": city})
 
 
 # Alternative implementation using LangChain's built-in WikipediaQueryRun tool
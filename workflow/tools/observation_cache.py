@@ -0,0 +1,90 @@
+"""Short-lived cache for tool observations.
+
+Weather and city facts are fetched over HTTP and change slowly, so repeated
+questions about the same city within the TTL reuse the last observation.
+Concurrent lookups of the same city share one call, so a speculative
+prefetch and the agent's own tool call never fetch twice. Error observations
+are never cached.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import wraps
+
+_log = logging.getLogger(__name__)
+
+
+class ObservationCache:
+    """Thread-safe LRU cache with TTL for city-keyed tool observations.
+
+    Args:
+        ttl (float): Seconds an observation stays valid
+        maxsize (int): Maximum number of cities kept
+    """
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # city key -> (expires_at, observation)
+        self._inflight = {}  # city key -> Future of the call fetching it
+        self._lock = threading.Lock()
+
+    def __call__(self, func):
+        """Decorate a `func(city)` tool function with this cache."""
+        @wraps(func)
+        def cached(city):
+            key = city.strip().lower() if isinstance(city, str) else city
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[1])
+                pending = self._inflight.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._inflight[key] = Future()
+                    owner = True
+                else:
+                    self.hits += 1
+                    owner = False
+
+            if not owner:
+                # Another thread is fetching this city; wait for its observation
+                observation = pending.result()
+                return dict(observation) if isinstance(observation, dict) else observation
+
+            _log.debug("%s: cache miss for %r, hit rate %.0f%%", func.__name__, key, 100 * self.hit_rate())
+            try:
+                observation = func(city)
+            except BaseException as e:
+                with self._lock:
+                    del self._inflight[key]
+                pending.set_exception(e)
+                raise
+            with self._lock:
+                if isinstance(observation, dict) and "error" not in observation:
+                    self._entries[key] = (now + self.ttl, observation)
+                    self._entries.move_to_end(key)
+                    if len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                del self._inflight[key]
+            pending.set_result(observation)
+            return dict(observation) if isinstance(observation, dict) else observation
+
+        cached.cache = self
+        return cached
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
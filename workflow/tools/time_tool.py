@@ -5,9 +5,11 @@ This tool potential to convert to a MCP call
 This module provides a tool to get current time information for cities.
 """
 
-import requests
 import datetime
-import pytz
+import difflib
+import types
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from typing import Dict, Any, Optional, Type, List
 from pydantic import BaseModel, Field
 from langchain.tools import BaseTool, tool
@@ -36,6 +38,46 @@ CITY_TIMEZONES = {
     "amsterdam": "Europe/Amsterdam",
 }
 
+# datetime|day of week|day of year|week number|UTC offset, formatted in one
+# strftime call; measured faster than isoformat plus per-field arithmetic
+_TIME_FIELDS_FORMAT = "%Y-%m-%d %H:%M:%S|%A|%j|%U|%z"
+
+# Common alternative names -> key in CITY_TIMEZONES
+CITY_ALIASES = {
+    "nyc": "new york",
+    "new york city": "new york",
+    "la": "los angeles",
+    "peking": "beijing",
+    "hk": "hong kong",
+    "são paulo": "sao paulo",
+    "bombay": "mumbai",
+    "i̇stanbul": "istanbul",  # "İstanbul".casefold()
+}
+
+# tzinfo objects for CITY_TIMEZONES and CITY_ALIASES, built once instead of on
+# every lookup; keys are casefolded so lookups are locale-independent
+_TZ_CACHE = types.MappingProxyType({
+    **{city.casefold(): ZoneInfo(tz) for city, tz in CITY_TIMEZONES.items()},
+    **{alias.casefold(): ZoneInfo(CITY_TIMEZONES[city]) for alias, city in CITY_ALIASES.items()},
+})
+
+
+@lru_cache(maxsize=1024)
+def _resolve_timezone(city: str) -> Optional[datetime.tzinfo]:
+    """Look up a city's timezone, tolerating small misspellings of known cities."""
+    key = city.strip().casefold()
+    timezone = _TZ_CACHE.get(key)
+    if timezone is None:
+        match = difflib.get_close_matches(key, _TZ_CACHE.keys(), n=1, cutoff=0.85)
+        if match:
+            timezone = _TZ_CACHE[match[0]]
+    return timezone
+
+
+def is_known_city(city: str) -> bool:
+    """Whether `city` is (a small misspelling of) a city with a known timezone."""
+    return _resolve_timezone(city) is not None
+
 class TimeInput(BaseModel):
     """Input for the time tool."""
     city: str = Field(..., description="The city to get time for")
@@ -47,49 +89,42 @@ class TimeTool(BaseTool):
     description: str = "Useful for getting current time information for a specific city. Input should be a city name."
     args_schema: Type[BaseModel] = TimeInput
     
-    def _get_timezone(self, city: str) -> Optional[str]:
-        """Get timezone for a city."""
-        city_lower = city.lower()
-        return CITY_TIMEZONES.get(city_lower)
+    def _get_timezone(self, city: str) -> Optional[datetime.tzinfo]:
+        """Get timezone for a city, tolerating small misspellings of known cities."""
+        return _resolve_timezone(city)
     
     def _run(self, city: str) -> Dict[str, Any]:
         """Run the time tool."""
         # Try to get timezone from our mapping
-        timezone_str = self._get_timezone(city)
+        timezone = self._get_timezone(city)
         
-        if not timezone_str:
-            # If not in our mapping, try to get from WorldTimeAPI
-            try:
-                response = requests.get(f"http://worldtimeapi.org/api/timezone/Etc/UTC")
-                response.raise_for_status()
-                utc_data = response.json()
-                
-                # Return UTC time with a note that city timezone is not available
-                utc_datetime = datetime.datetime.fromisoformat(utc_data["datetime"].replace("Z", "+00:00"))
-                
-                return {
-                    "city": city,
-                    "timezone": "UTC",
-                    "datetime": utc_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-                    "note": f"Timezone for {city} not found. Showing UTC time instead."
-                }
-            except requests.exceptions.RequestException as e:
-                return {"error": f"Error fetching time data: {str(e)}"}
+        if timezone is None:
+            # Not in our mapping; report UTC from the local clock
+            utc_datetime = datetime.datetime.now(datetime.timezone.utc)
+            return {
+                "city": city,
+                "timezone": "UTC",
+                "datetime": utc_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+                "note": f"Timezone for {city} not found. Showing UTC time instead."
+            }
         
         # Get time for the timezone
         try:
-            timezone = pytz.timezone(timezone_str)
             now = datetime.datetime.now(timezone)
             
+            date_time, day_of_week, day_of_year, week_number, utc_offset = now.strftime(
+                _TIME_FIELDS_FORMAT
+            ).split("|")
+            
             time_data = {
                 "city": city,
-                "timezone": timezone_str,
-                "datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
-                "day_of_week": now.strftime("%A"),
-                "day_of_year": now.strftime("%j"),
-                "week_number": now.strftime("%U"),
+                "timezone": timezone.key,
+                "datetime": date_time,
+                "day_of_week": day_of_week,
+                "day_of_year": day_of_year,
+                "week_number": week_number,
                 "is_dst": bool(now.dst()),
-                "utc_offset": now.strftime("%z")
+                "utc_offset": utc_offset
             }
             
             return time_data
@@ -128,11 +163,12 @@ def get_current_time(timezone: Optional[str] = None) -> str:
     """
     if timezone:
         try:
-            tz = pytz.timezone(timezone)
-        except pytz.exceptions.UnknownTimeZoneError:
+            # ZoneInfo caches the zones it has loaded
+            tz = ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
             return f"Unknown timezone: {timezone}. Using UTC instead."
     else:
-        tz = pytz.UTC
+        tz = datetime.timezone.utc
     
     now = datetime.datetime.now(tz)
     return now.strftime('%Y-%m-%d %H:%M:%S %Z')
\ No newline at end of file
@@ -5,16 +5,82 @@ This tool potential to convert to a MCP call
 This module provides a tool to get weather information using the WeatherAPI.com API.
 """
 
+import asyncio
 import os
 import requests
-from typing import Dict, Any, Optional, Type
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, List, Optional, Type
 from pydantic import BaseModel, Field
 from langchain.tools import BaseTool, tool
 from dotenv import load_dotenv
 
+from .observation_cache import ObservationCache
+
 # Load environment variables
 load_dotenv()
 
+_WEATHER_URL = "https://api.weatherapi.com/v1/current.json"
+
+# (connect, read) timeouts in seconds for WeatherAPI.com requests
+REQUEST_TIMEOUT = (3.05, 10)
+
+# Keep-alive connections kept per host; a WeatherBatchTool call opens one per
+# city at once, and connections beyond the pool are closed after each request
+HTTP_POOL_SIZE = int(os.getenv("WEATHER_HTTP_POOL_SIZE", "20"))
+
+# One pooled session for all lookups, so repeated calls reuse the connection;
+# transient gateway errors are retried with a short backoff
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=HTTP_POOL_SIZE,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+# Seconds a WeatherAPI.com response is reused for the same location
+CACHE_TTL = 300
+
+@ObservationCache(ttl=CACHE_TTL, maxsize=512)
+def _fetch_weather(location: str) -> Dict[str, Any]:
+    """Fetch and format the current weather for a "city[,country]" location.
+
+    Responses are reused for CACHE_TTL seconds per location and concurrent
+    lookups of one location share a single request; errors are not cached.
+    """
+    api_key = os.getenv("WEATHERAPI_KEY")
+    try:
+        # params= URL-encodes city names with spaces or non-ASCII characters
+        response = _session.get(_WEATHER_URL, params={"key": api_key, "q": location}, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+    
+        # Format the weather data
+        weather_data = {
+            "city": data["location"]["name"],
+            "country": data["location"]["country"],
+            "temperature": f"{data['current']['temp_c']:.1f}°C",
+            "feels_like": f"{data['current']['feelslike_c']:.1f}°C",
+            "humidity": f"{data['current']['humidity']}%",
+            "pressure": f"{data['current']['pressure_mb']} hPa",
+            "weather": data["current"]["condition"]["text"],
+            "description": data["current"]["condition"]["text"],
+            "wind_speed": f"{data['current']['wind_kph']} km/h"
+        }
+    
+        return weather_data
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 401:
+            return {"error": "Invalid WeatherAPI.com API key. Please check your API key and try again."}
+        elif e.response.status_code == 403:
+            return {"error": "Access to WeatherAPI.com is forbidden. Your API key may have exceeded its quota."}
+        else:
+            return {"error": f"HTTP error from WeatherAPI.com: {str(e)}"}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Error fetching weather data: {str(e)}"}
+
 class WeatherInput(BaseModel):
     """Input for the weather tool."""
     city: str = Field(..., description="The city to get weather for")
@@ -38,41 +104,30 @@ class WeatherTool(BaseTool):
             return {"error": "Please set a valid WeatherAPI.com API key in your .env file. Sign up at https://www.weatherapi.com/my/ to get a free API key."}
         
         location = f"{city},{country}" if country else city
-        url = f"http://api.weatherapi.com/v1/current.json?key={api_key}&q={location}"
-        
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Format the weather data
-            weather_data = {
-                "city": data["location"]["name"],
-                "country": data["location"]["country"],
-                "temperature": f"{data['current']['temp_c']:.1f}°C",
-                "feels_like": f"{data['current']['feelslike_c']:.1f}°C",
-                "humidity": f"{data['current']['humidity']}%",
-                "pressure": f"{data['current']['pressure_mb']} hPa",
-                "weather": data["current"]["condition"]["text"],
-                "description": data["current"]["condition"]["text"],
-                "wind_speed": f"{data['current']['wind_kph']} km/h"
-            }
-            
-            return weather_data
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 401:
-                return {"error": "Invalid WeatherAPI.com API key. Please check your API key and try again."}
-            elif e.response.status_code == 403:
-                return {"error": "Access to WeatherAPI.com is forbidden. Your API key may have exceeded its quota."}
-            else:
-                return {"error": f"HTTP error from WeatherAPI.com: {str(e)}"}
-        except requests.exceptions.RequestException as e:
-            return {"error": f"Error fetching weather data: {str(e)}"}
+        return _fetch_weather(location)
     
     async def _arun(self, city: str, country: Optional[str] = None) -> Dict[str, Any]:
         """Run the weather tool asynchronously."""
-        # For simplicity, we're using the synchronous version
-        return self._run(city, country)
+        # The lookup is blocking HTTP; keep it off the event loop
+        return await asyncio.to_thread(self._run, city, country)
+
+    async def _arun_many(self, cities: List[str], country: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the weather for several cities concurrently.
+
+        Args:
+            cities: The cities to get weather for
+            country: The country code applied to every city (optional)
+
+        Returns:
+            One weather dict per city, in the order of `cities`; a failed
+            lookup yields an error dict instead of failing the batch
+        """
+        results = await asyncio.gather(*(self._arun(city, country) for city in cities), return_exceptions=True)
+        return [
+            {"error": f"Error fetching weather data for {city}: {str(result)}"}
+            if isinstance(result, Exception) else result
+            for city, result in zip(cities, results)
+        ]
 
 
 @tool
@@ -87,4 +142,19 @@ def get_weather(city: str, country: Optional[str] = None) -> Dict[str, Any]:
         Dict containing weather information
     """
     weather_tool = WeatherTool()
-    return weather_tool.invoke({"city": city, "country": country})
\ No newline at end of file
+    return weather_tool.invoke({"city": city, "country": country})
+
+
+@tool
+def get_weather_batch(cities: List[str], country: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get current weather information for several cities at once.
+    
+    Args:
+        cities: The cities to get weather for
+        country: The country code (optional)
+        
+    Returns:
+        List of weather dicts, one per city in the same order
+    """
+    # Tools are called from worker threads, which have no running event loop
+    return asyncio.run(WeatherTool()._arun_many(cities, country))
@@ -1,8 +1,125 @@
-from .agent import Agent
+from .agent import Agent, BATCH_CONCURRENCY_LIMIT
 from .output_parser import AgentResponse, FunctionCall
-import json
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.runnables import RunnableLambda
+from .patterns import extract_parse_error, partition_think
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from functools import lru_cache
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+_log = logging.getLogger(__name__)
+
+# Maximum number of astream_tokens agent runs in flight across all Workflows,
+# to stay within the provider's rate limits
+STREAM_CONCURRENCY_LIMIT = int(os.getenv("WORKFLOW_MAX_CONCURRENCY", "10"))
+
+
+class _StreamSlots:
+    """First-come, first-served semaphore shared by tasks on different event loops.
+
+    Each streaming request runs on its own event loop, so an asyncio.Semaphore
+    cannot be shared and a thread semaphore would block the loop. A waiter
+    parks on a future of its own loop; release hands the slot straight to the
+    oldest waiter through call_soon_threadsafe.
+    """
+
+    def __init__(self, limit):
+        self._free = limit
+        self._waiters = deque()  # (loop, future) in arrival order
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                    granted = False
+                except ValueError:
+                    # release already handed this waiter the slot
+                    granted = True
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(_grant_slot, future)
+                    return
+                except RuntimeError:
+                    # The waiter's loop is closed; try the next one
+                    continue
+            self._free += 1
+
+
+def _grant_slot(future):
+    if not future.done():
+        future.set_result(None)
+
+
+_stream_slots = _StreamSlots(STREAM_CONCURRENCY_LIMIT)
+
+
+def _step_function_call(step):
+    """Convert an (action, observation) step to a {"tool", "parameters"} call."""
+    action = step[0]
+    tool_input = action.tool_input
+    return {
+        "tool": action.tool,
+        "parameters": tool_input if type(tool_input) is dict else {"input": tool_input}
+    }
+
+
+def format_agent_output(result):
+    """Custom output formatter for structured response."""
+    steps = result.get("intermediate_steps", [])
+    thinking = steps[0][0].log if steps else "No reasoning."
+    return {
+        "thinking": thinking,
+        "function_calls": list(map(_step_function_call, steps)),
+        "response": result["output"]
+    }
+
+# Stateless, so one instance is shared by every Workflow's agent_chain
+_agent_output_formatter = RunnableLambda(format_agent_output)
+
+
+class ResultObject:
+    """Result of Workflow.invoke, exposing the fields as attributes.
+    
+    agent_response may be given as the AgentResponse model; it is dumped to
+    a dict on first access, so callers that never read it skip the dump.
+    """
+    
+    __slots__ = ("final_response", "tool_outputs", "conversation_history", "_agent_response")
+    
+    def __init__(self, final_response, tool_outputs, conversation_history, agent_response):
+        self.final_response = final_response
+        self.tool_outputs = tool_outputs
+        self.conversation_history = conversation_history
+        self._agent_response = agent_response
+    
+    @property
+    def agent_response(self):
+        response = self._agent_response
+        if isinstance(response, AgentResponse):
+            response = self._agent_response = response.model_dump()
+        return response
+
+
 class Workflow:
     def __init__(self, provider="openai", model_name=None, temperature=0.7, **kwargs):
         """Initialize the Workflow with a configurable Agent.
@@ -15,37 +132,21 @@ class Workflow:
         """
         self.agent = Agent(provider=provider, model_name=model_name, temperature=temperature, **kwargs)
         
-        # Define a custom output formatter for structured response
-        def format_agent_output(result):
-            steps = result.get("intermediate_steps", [])
-            thinking = steps[0][0].log if steps else "No reasoning."
-            function_calls = [
-                {
-                    "tool": step[0].tool,
-                    "parameters": step[0].tool_input if isinstance(step[0].tool_input, dict) else {"input": step[0].tool_input}
-                }
-                for step in steps
-            ]
-            return {
-                "thinking": thinking,
-                "function_calls": function_calls,
-                "response": result["output"]
-            }
-        
         # Create the Runnable chain by piping the agent executor through the formatter
-        self.agent_chain = self.agent.agent_executor | RunnableLambda(format_agent_output)
+        self.agent_chain = self.agent.agent_executor | _agent_output_formatter
 
     def execute_workflow(self, user_input: str):
         # Simplified workflow execution
         state = {"input": user_input}
-        result = self.agent.process_input(state)
+        result = self.agent.process_input(state, verbose_tools=True)
         
         # Use the function_calls directly if available, otherwise convert from tool_calls
         function_calls = []
         if "function_calls" in result and result["function_calls"]:
-            # Use the pre-formatted function calls
+            # Use the pre-formatted function calls; the agent builds them, so
+            # they skip validation
             for call in result["function_calls"]:
-                function_calls.append(FunctionCall(
+                function_calls.append(FunctionCall.model_construct(
                     tool=call["tool"],
                     parameters=call["parameters"]
                 ))
@@ -70,182 +171,213 @@ class Workflow:
             "conversation_history": []
         }
         
-    def invoke(self, user_input: str):
+    def invoke(self, user_input: str, include_history: bool = True, history_limit: int = None):
         # Method to match the app.py implementation - preferred in Langchain and Langgraph
+        # Pass include_history=False when only the response is needed, or
+        # history_limit to return just the most recent messages
         
         try:
             # Use the agent's process_input method which handles memory
-            result = self.agent.process_input(user_input)
-            
-            # Parse and separate reasoning from final output if using <think> tags
-            response = result["response"]
-            thinking = result.get("reasoning", "")
-            
-            # Check for <think> tag format in response
-            import re
-            think_match = re.search(r'<think>([\s\S]+?)</think>([\s\S]*)', response)
-            if think_match:
-                thinking = think_match.group(1).strip()
-                response = think_match.group(2).strip()
+            result = self.agent.process_input(user_input, verbose_tools=True)
+            return self._build_result(result, include_history, history_limit)
+        except Exception as e:
+            return self._handle_invoke_error(user_input, e)
+    
+    async def ainvoke(self, user_input: str, include_history: bool = True, history_limit: int = None):
+        """Async invoke for callers on an event loop; returns the same ResultObject.
+        
+        The agent's LLM and executor calls are awaited instead of blocking a thread.
+        """
+        try:
+            result = await self.agent.aprocess_input(user_input, verbose_tools=True)
+            return self._build_result(result, include_history, history_limit)
+        except Exception as e:
+            return self._handle_invoke_error(user_input, e)
+    
+    async def abatch(self, user_inputs, max_concurrency=BATCH_CONCURRENCY_LIMIT,
+                     include_history=True, history_limit=None):
+        """Invoke several inputs concurrently.
+        
+        The turns share this workflow's memory, so each is recorded as it
+        finishes; use separate workflows for independent conversations.
+        
+        Args:
+            user_inputs: The user messages
+            max_concurrency: Maximum number of agent runs in flight, to stay
+                within the provider's rate limits
+            include_history, history_limit: See invoke
+        
+        Returns:
+            list: One ResultObject per input, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run(user_input):
+            async with semaphore:
+                return await self.ainvoke(user_input, include_history, history_limit)
+        
+        return await asyncio.gather(*(run(user_input) for user_input in user_inputs))
+    
+    def _build_result(self, result, include_history=True, history_limit=None):
+        """Turn the agent result into the ResultObject returned by invoke."""
+        # Parse and separate reasoning from final output if using <think> tags
+        response = result["response"]
+        thinking = result.get("reasoning", "")
+        
+        # Check for <think> tag format in response
+        think_split = partition_think(response)
+        if think_split:
+            thinking = think_split[0].strip()
+            response = think_split[1].strip()
+        
+        # Create function calls from the result
+        function_calls = []
+        if "function_calls" in result:
+            for call in result["function_calls"]:
+                function_calls.append(FunctionCall.model_construct(
+                    tool=call["tool"],
+                    parameters=call["parameters"]
+                ))
+        
+        # Create the AgentResponse object with structured output
+        agent_response = AgentResponse(
+            thinking=thinking,
+            function_calls=function_calls,
+            response=response
+        )
+        
+        conversation_history = self._load_conversation_history(history_limit) if include_history else []
+
+        return ResultObject(
+            final_response=response,
+            tool_outputs={"reasoning": thinking, "steps": result.get("tool_calls", [])},
+            conversation_history=conversation_history,
+            agent_response=agent_response
+        )
+    
+    def _load_conversation_history(self, history_limit=None):
+        """Read the summary and recent messages from memory for the invoke result.
+        
+        Args:
+            history_limit: Maximum number of recent messages to include (all if None)
+        """
+        conversation_history = []
+        try:
+            memory_vars = self.agent.memory.load_memory_variables({})
             
-            # Create function calls from the result
-            function_calls = []
-            if "function_calls" in result:
-                for call in result["function_calls"]:
-                    function_calls.append(FunctionCall(
-                        tool=call["tool"],
-                        parameters=call["parameters"]
-                    ))
+            # Get the memory buffer summary and recent messages
+            if 'history' in memory_vars and memory_vars['history']:
+                # ConversationSummaryBufferMemory provides history as a string
+                history_content = memory_vars['history']
+                conversation_history.append({
+                    "type": "summary",
+                    "content": history_content
+                })
             
-            # Create the AgentResponse object with structured output
-            agent_response = AgentResponse(
-                thinking=thinking,
-                function_calls=function_calls,
-                response=response
-            )
+            # Also get the moving summary buffer if available
+            summary = getattr(self.agent.memory, 'moving_summary_buffer', '')
+            if summary:
+                conversation_history.append({
+                    "type": "moving_summary",
+                    "content": summary
+                })
             
-            # Create a result object with the expected attributes
-            class ResultObject:
-                def __init__(self, final_response, tool_outputs, conversation_history, agent_response):
-                    self.final_response = final_response
-                    self.tool_outputs = tool_outputs
-                    self.conversation_history = conversation_history
-                    self.agent_response = agent_response
+            # Get recent chat messages
+            messages = self.agent.memory.chat_memory.message_dicts()
+            if history_limit is not None:
+                # messages[-0:] would be every message, not none
+                messages = messages[-history_limit:] if history_limit > 0 else []
+            conversation_history.extend(messages)
+                    
+        except Exception as e:
+            _log.warning("Error loading conversation history: %s", e)
+            conversation_history = []
+        return conversation_history
+    
+    def _handle_invoke_error(self, user_input, e):
+        """Recover the answer from an output parsing failure, or re-raise `e`."""
+        # Enhanced error handling for parsing failures
+        error_str = str(e)
+        
+        # Try to extract content from OUTPUT_PARSING_FAILURE errors
+        if "Could not parse LLM output" in error_str or "OUTPUT_PARSING_FAILURE" in error_str:
+            extracted_content = extract_parse_error(error_str)
             
-            # Get conversation history and summary from memory
-            try:
-                memory_vars = self.agent.memory.load_memory_variables({})
-                conversation_history = []
+            if extracted_content:
+                # Parse thinking and response from extracted content
+                thinking = ""
+                response = extracted_content
                 
-                # Get the memory buffer summary and recent messages
-                if 'history' in memory_vars and memory_vars['history']:
-                    # ConversationSummaryBufferMemory provides history as a string
-                    history_content = memory_vars['history']
-                    conversation_history.append({
-                        "type": "summary",
-                        "content": history_content
-                    })
+                # Handle <think> tags in extracted content
+                think_split = partition_think(extracted_content)
+                if think_split:
+                    thinking = think_split[0].strip()
+                    response = think_split[1].strip()
                 
-                # Also get the moving summary buffer if available
-                summary = getattr(self.agent.memory, 'moving_summary_buffer', '')
-                if summary:
-                    conversation_history.append({
-                        "type": "moving_summary",
-                        "content": summary
-                    })
+                # Save to memory
+                self.agent.memory.save_context(
+                    {"input": user_input},
+                    {"output": response}
+                )
                 
-                # Get recent chat messages
-                chat_history = self.agent.memory.chat_memory.messages
-                for message in chat_history:
-                    if hasattr(message, 'content'):
-                        message_type = "human" if hasattr(message, 'type') and message.type == "human" else "ai"
-                        conversation_history.append({
-                            "type": message_type,
-                            "content": message.content
-                        })
-                        
-            except Exception as e:
-                print(f"Error loading conversation history: {e}")
-                conversation_history = []
-
-            return ResultObject(
-                final_response=response,
-                tool_outputs={"reasoning": thinking, "steps": result.get("tool_calls", [])},
-                conversation_history=conversation_history,
-                agent_response=agent_response.model_dump()
-            )
-            
-        except Exception as e:
-            # Enhanced error handling for parsing failures
-            error_str = str(e)
-            
-            # Try to extract content from OUTPUT_PARSING_FAILURE errors
-            if "Could not parse LLM output" in error_str or "OUTPUT_PARSING_FAILURE" in error_str:
-                import re
-                patterns = [
-                    r'Could not parse LLM output: `([\s\S]+?)`',
-                    r'Stream error: "Could not parse LLM output: `([\s\S]+?)`',
-                    r'OUTPUT_PARSING_FAILURE[\s\S]*?`([\s\S]+?)`'
-                ]
+                # Create structured response
+                agent_response = AgentResponse(
+                    thinking=thinking or "I processed your request despite a formatting issue.",
+                    function_calls=[],
+                    response=response
+                )
                 
-                extracted_content = None
-                for pattern in patterns:
-                    match = re.search(pattern, error_str, re.DOTALL)
-                    if match and match.group(1):
-                        extracted_content = match.group(1)
-                        break
-                
-                if extracted_content:
-                    # Parse thinking and response from extracted content
-                    thinking = ""
-                    response = extracted_content
-                    
-                    # Handle <think> tags in extracted content
-                    think_match = re.search(r'<think>([\s\S]+?)</think>([\s\S]*)', extracted_content)
-                    if think_match:
-                        thinking = think_match.group(1).strip()
-                        response = think_match.group(2).strip()
-                    
-                    # Save to memory
-                    self.agent.memory.save_context(
-                        {"input": user_input},
-                        {"output": response}
-                    )
+                # Get conversation history and summary from memory for error case
+                try:
+                    memory_vars = self.agent.memory.load_memory_variables({})
+                    conversation_history = []
                     
-                    # Create structured response
-                    agent_response = AgentResponse(
-                        thinking=thinking or "I processed your request despite a formatting issue.",
-                        function_calls=[],
-                        response=response
-                    )
-                    
-                    class ResultObject:
-                        def __init__(self, final_response, tool_outputs, conversation_history, agent_response):
-                            self.final_response = final_response
-                            self.tool_outputs = tool_outputs
-                            self.conversation_history = conversation_history
-                            self.agent_response = agent_response
+                    # Get the memory buffer summary and recent messages
+                    if 'history' in memory_vars and memory_vars['history']:
+                        history_content = memory_vars['history']
+                        conversation_history.append({
+                            "type": "summary",
+                            "content": history_content
+                        })
                     
-                    # Get conversation history and summary from memory for error case
-                    try:
-                        memory_vars = self.agent.memory.load_memory_variables({})
-                        conversation_history = []
-                        
-                        # Get the memory buffer summary and recent messages
-                        if 'history' in memory_vars and memory_vars['history']:
-                            history_content = memory_vars['history']
-                            conversation_history.append({
-                                "type": "summary",
-                                "content": history_content
-                            })
+                    # Also get the moving summary buffer if available
+                    summary = getattr(self.agent.memory, 'moving_summary_buffer', '')
+                    if summary:
+                        conversation_history.append({
+                            "type": "moving_summary",
+                            "content": summary
+                        })
                         
-                        # Also get the moving summary buffer if available
-                        summary = getattr(self.agent.memory, 'moving_summary_buffer', '')
-                        if summary:
-                            conversation_history.append({
-                                "type": "moving_summary",
-                                "content": summary
-                            })
-                            
-                    except Exception as mem_error:
-                        print(f"Error loading conversation history in error handler: {mem_error}")
-                        conversation_history = []
-                    
-                    return ResultObject(
-                        final_response=response,
-                        tool_outputs={"reasoning": thinking, "steps": []},
-                        conversation_history=conversation_history,
-                        agent_response=agent_response.model_dump()
-                    )
-            
-            # If we can't extract content, raise the original error
-            raise e
+                except Exception as mem_error:
+                    _log.warning("Error loading conversation history in error handler: %s", mem_error)
+                    conversation_history = []
+                
+                return ResultObject(
+                    final_response=response,
+                    tool_outputs={"reasoning": thinking, "steps": []},
+                    conversation_history=conversation_history,
+                    agent_response=agent_response
+                )
+        
+        # If we can't extract content, raise the original error
+        raise e
         
     def execute(self, user_input: str):
         # Legacy method, maintained for backward compatibility
         # Use invoke() instead as it's the preferred method in Langchain and Langgraph
         return self.invoke(user_input)
         
+    def _enhanced_input(self, user_input):
+        """Build the agent input with the conversation summary and history from memory.
+        
+        Falls back to the bare question if the memory cannot be read.
+        """
+        try:
+            return self.agent.build_enhanced_input(user_input)
+        except Exception as e:
+            _log.warning("Error loading memory variables: %s", e)
+            return f"Current Question: {user_input}"
+    
     def stream(self, user_input: str, stream_mode=None):
         """Stream the workflow execution results.
         
@@ -256,52 +388,31 @@ class Workflow:
         Yields:
             tuple: (stream_mode, chunk) pairs where chunk is the streamed data
         """
-        # Get conversation summary and history from memory using load_memory_variables
-        try:
-            memory_vars = self.agent.memory.load_memory_variables({})
-            conversation_context = ""
-            
-            # Handle ConversationSummaryBufferMemory output (string format)
-            if 'history' in memory_vars and memory_vars['history']:
-                conversation_context = memory_vars['history']
-            
-            # Check for moving summary buffer
-            summary = getattr(self.agent.memory, 'moving_summary_buffer', '')
-            
-            # Memory state is working correctly - debug prints removed
-            
-            # Construct enhanced input with proper context
-            if summary and conversation_context:
-                enhanced_input = f"Previous Conversation Summary:\n{summary}\n\nRecent Conversation:\n{conversation_context}\n\nCurrent Question: {user_input}"
-            elif summary:
-                enhanced_input = f"Previous Conversation Summary:\n{summary}\n\nCurrent Question: {user_input}"
-            elif conversation_context:
-                enhanced_input = f"Conversation History:\n{conversation_context}\n\nCurrent Question: {user_input}"
-            else:
-                enhanced_input = f"Current Question: {user_input}"
-                
-        except Exception as e:
-            print(f"Error loading memory variables: {e}")
-            enhanced_input = f"Current Question: {user_input}"
+        self.agent.prefetch_tools(user_input)
         
-        # Stream from the agent executor with enhanced input
+        enhanced_input = self._enhanced_input(user_input)
+        
+        # Stream from the agent executor with enhanced input, keeping the
+        # final answer for memory
+        final_output = None
         for chunk in self.agent.agent_executor.stream(
             {"input": enhanced_input}
         ):
-            # Determine the mode based on the chunk content
-            if "intermediate_steps" in chunk:
-                mode = "updates"
-            else:
-                mode = "messages"
-                
-            # Format the chunk based on its type
-            formatted_chunk = self._format_chunk(mode, chunk)
-            yield mode, formatted_chunk
+            # Determine the mode based on the chunk content, and format the
+            # chunk from the steps already looked up
+            if isinstance(chunk, dict):
+                steps = chunk.get("intermediate_steps")
+                if steps is not None:
+                    yield "updates", _format_steps(steps, chunk)
+                    continue
+                final_output = chunk.get("output", final_output)
+            yield "messages", _format_message_chunk(chunk)
         
-        # Save the conversation to memory after streaming
+        # Save the conversation to memory after streaming; summarization, if
+        # due, runs in the background by default and does not delay the stream
         self.agent.memory.save_context(
             {"input": user_input},
-            {"output": "[Streaming response completed]"}
+            {"output": final_output if final_output is not None else "[Streaming response completed]"}
         )
     
     async def astream(self, user_input: str, stream_mode=None):
@@ -314,52 +425,31 @@ class Workflow:
         Yields:
             tuple: (stream_mode, chunk) pairs where chunk is the streamed data
         """
-        # Get conversation summary and history from memory using load_memory_variables
-        try:
-            memory_vars = self.agent.memory.load_memory_variables({})
-            conversation_context = ""
-            
-            # Handle ConversationSummaryBufferMemory output (string format)
-            if 'history' in memory_vars and memory_vars['history']:
-                conversation_context = memory_vars['history']
-            
-            # Check for moving summary buffer
-            summary = getattr(self.agent.memory, 'moving_summary_buffer', '')
-            
-            # Memory state is working correctly - debug prints removed
-            
-            # Construct enhanced input with proper context
-            if summary and conversation_context:
-                enhanced_input = f"Previous Conversation Summary:\n{summary}\n\nRecent Conversation:\n{conversation_context}\n\nCurrent Question: {user_input}"
-            elif summary:
-                enhanced_input = f"Previous Conversation Summary:\n{summary}\n\nCurrent Question: {user_input}"
-            elif conversation_context:
-                enhanced_input = f"Conversation History:\n{conversation_context}\n\nCurrent Question: {user_input}"
-            else:
-                enhanced_input = f"Current Question: {user_input}"
-                
-        except Exception as e:
-            print(f"Error loading memory variables: {e}")
-            enhanced_input = f"Current Question: {user_input}"
+        self.agent.prefetch_tools(user_input)
+        
+        enhanced_input = self._enhanced_input(user_input)
         
-        # Stream from the agent executor with enhanced input
+        # Stream from the agent executor with enhanced input, keeping the
+        # final answer for memory
+        final_output = None
         async for chunk in self.agent.agent_executor.astream(
             {"input": enhanced_input}
         ):
-            # Determine the mode based on the chunk content
-            if "intermediate_steps" in chunk:
-                mode = "updates"
-            else:
-                mode = "messages"
-                
-            # Format the chunk based on its type
-            formatted_chunk = self._format_chunk(mode, chunk)
-            yield mode, formatted_chunk
+            # Determine the mode based on the chunk content, and format the
+            # chunk from the steps already looked up
+            if isinstance(chunk, dict):
+                steps = chunk.get("intermediate_steps")
+                if steps is not None:
+                    yield "updates", _format_steps(steps, chunk)
+                    continue
+                final_output = chunk.get("output", final_output)
+            yield "messages", _format_message_chunk(chunk)
         
-        # Save the conversation to memory after streaming
+        # Save the conversation to memory after streaming; summarization, if
+        # due, runs in the background by default and does not delay the stream
         self.agent.memory.save_context(
             {"input": user_input},
-            {"output": "[Streaming response completed]"}
+            {"output": final_output if final_output is not None else "[Streaming response completed]"}
         )
             
     async def astream_tokens(self, user_input: str, callbacks=None):
@@ -375,50 +465,25 @@ class Workflow:
         Returns:
             dict: The final result from the agent
         """
-        from langchain_core.runnables import RunnableConfig
-        
         # Create a config with the provided callbacks
-        config = RunnableConfig(callbacks=callbacks)
+        config = RunnableConfig(callbacks=callbacks, max_concurrency=STREAM_CONCURRENCY_LIMIT)
         
         # Pass the agent reference to the StreamingHandler
         for callback in callbacks or []:
             if hasattr(callback, 'agent') and callback.agent is None:
                 callback.agent = self.agent
         
-        # Get conversation summary and history from memory using load_memory_variables
-        try:
-            memory_vars = self.agent.memory.load_memory_variables({})
-            conversation_context = ""
-            
-            # Handle ConversationSummaryBufferMemory output
-            if 'history' in memory_vars:
-                if isinstance(memory_vars['history'], str):
-                    # String format - includes summary and recent messages
-                    conversation_context = memory_vars['history']
-                elif isinstance(memory_vars['history'], list):
-                    # Message list format - convert to string
-                    for message in memory_vars['history']:
-                        if hasattr(message, 'content'):
-                            role = "Human" if hasattr(message, 'type') and message.type == "human" else "Assistant"
-                            conversation_context += f"{role}: {message.content}\n"
-            
-            # Check for moving summary buffer (ConversationSummaryBufferMemory specific)
-            if hasattr(self.agent.memory, 'moving_summary_buffer') and self.agent.memory.moving_summary_buffer:
-                summary = self.agent.memory.moving_summary_buffer
-                if conversation_context:
-                    enhanced_input = f"Previous Conversation Summary:\n{summary}\n\nRecent Conversation:\n{conversation_context}\nCurrent Question: {user_input}"
-                else:
-                    enhanced_input = f"Previous Conversation Summary:\n{summary}\nCurrent Question: {user_input}"
-            else:
-                enhanced_input = f"Conversation History:\n{conversation_context}\nCurrent Question: {user_input}" if conversation_context else f"Current Question: {user_input}"
-                
-        except Exception as e:
-            print(f"Error loading memory variables: {e}")
-            # Fallback to basic input
-            enhanced_input = f"Current Question: {user_input}"
+        self.agent.prefetch_tools(user_input)
         
-        # Run the agent asynchronously and return the final result
-        result = await self.agent.agent_executor.ainvoke({"input": enhanced_input}, config=config)
+        enhanced_input = self._enhanced_input(user_input)
+        
+        # Run the agent asynchronously and return the final result, waiting
+        # in turn for a free slot without blocking this request's event loop
+        await _stream_slots.acquire()
+        try:
+            result = await self.agent.agent_executor.ainvoke({"input": enhanced_input}, config=config)
+        finally:
+            _stream_slots.release()
         
         # Save the conversation to memory after completion
         self.agent.memory.save_context(
@@ -427,71 +492,84 @@ class Workflow:
         )
         
         return result
-    
-    def _format_chunk(self, mode, chunk):
-        """Format a chunk based on its content with structured output parsing.
-        
-        Args:
-            mode (str): The determined mode ("updates" or "messages")
-            chunk: The chunk data
-            
-        Returns:
-            dict: A formatted representation of the chunk
-        """
-        if mode == "updates":
-            # Format update chunks (reasoning steps, tool calls, etc.)
-            if isinstance(chunk, dict) and "intermediate_steps" in chunk:
-                steps = chunk.get("intermediate_steps", [])
-                if steps:
-                    last_step = steps[-1]
-                    if isinstance(last_step, tuple) and len(last_step) >= 2:
-                        action = last_step[0]
-                        observation = last_step[1]
-                        
-                        if hasattr(action, "tool") and hasattr(action, "tool_input") and hasattr(action, "log"):
-                            # Parse thinking from log if it contains <think> tags
-                            thinking = action.log
-                            import re
-                            think_match = re.search(r'<think>([\s\S]+?)</think>', action.log)
-                            if think_match:
-                                thinking = think_match.group(1).strip()
-                            
-                            return {
-                                "type": "tool_usage",
-                                "tool": action.tool,
-                                "input": action.tool_input,
-                                "thought": thinking
-                            }
-            return {"type": "thinking", "content": str(chunk)}
-        
-        elif mode == "messages":
-            # Format message chunks (LLM tokens) with reasoning separation
-            content = ""
-            if hasattr(chunk, "content"):
-                content = chunk.content
-            elif isinstance(chunk, dict) and "output" in chunk:
-                content = chunk.get("output", "")
-            else:
-                content = str(chunk)
-            
-            # Check for <think> tags in streaming content
-            import re
-            think_match = re.search(r'<think>([\s\S]+?)</think>([\s\S]*)', content)
-            if think_match:
-                thinking = think_match.group(1).strip()
-                response = think_match.group(2).strip()
+
+
+def _format_update_chunk(chunk):
+    """Format an update chunk (reasoning steps, tool calls, etc.)."""
+    return _format_steps(chunk.get("intermediate_steps") if isinstance(chunk, dict) else None, chunk)
+
+
+def _format_steps(steps, chunk):
+    """Format an update chunk from its already extracted intermediate steps."""
+    if steps:
+        last_step = steps[-1]
+        if isinstance(last_step, tuple) and len(last_step) >= 2:
+            action = last_step[0]
+            log = getattr(action, "log", None)
+            if log is not None and hasattr(action, "tool") and hasattr(action, "tool_input"):
+                # Parse thinking from log if it contains <think> tags
+                thinking = log
+                think_split = partition_think(log)
+                if think_split:
+                    thinking = think_split[0].strip()
+                
                 return {
-                    "type": "structured_token",
-                    "thinking": thinking,
-                    "content": response
+                    "type": "tool_usage",
+                    "tool": action.tool,
+                    "input": action.tool_input,
+                    "thought": thinking
                 }
-            
-            return {"type": "token", "content": content}
-        
-        # Default formatting for unknown modes
-        return {"type": "unknown", "content": str(chunk)}
+    return {"type": "thinking", "content": str(chunk)}
+
+
+def _format_message_chunk(chunk):
+    """Format a message chunk (LLM tokens) with reasoning separation."""
+    content = getattr(chunk, "content", None)
+    if content is None:
+        if isinstance(chunk, dict) and "output" in chunk:
+            content = chunk["output"]
+        else:
+            content = str(chunk)
+    
+    # Check for <think> tags in streaming content
+    think_split = partition_think(content)
+    if think_split is None:
+        return {"type": "token", "content": content}
+    return {
+        "type": "structured_token",
+        "thinking": think_split[0].strip(),
+        "content": think_split[1].strip()
+    }
+
+
+# Stream mode -> chunk formatter, so formatting a chunk is one lookup and call
+_CHUNK_FORMATTERS = {
+    "updates": _format_update_chunk,
+    "messages": _format_message_chunk,
+}
+
+
+@lru_cache(maxsize=8)
+def get_workflow(provider="openai", model_name=None, temperature=0.7):
+    """Return the shared Workflow for an LLM configuration, creating it on first use.
+    
+    Callers asking for the same configuration get the same Workflow, and so
+    share its Agent and conversation memory.
+    
+    Args:
+        provider: The LLM provider (openai, groq, google)
+        model_name: The specific model name to use (defaults to provider's default)
+        temperature: The temperature for the LLM
+    """
+    return Workflow(provider=provider, model_name=model_name, temperature=temperature)
+
+# The module-level helpers use the default Workflow, built on first call
+# rather than at import time
+
+def invoke(user_input: str):
+    """Invoke the default workflow; the preferred way to use this module."""
+    return get_workflow().invoke(user_input)
 
-# Export the invoke method as the preferred way to use this module
-invoke = Workflow().invoke
-# For backward compatibility
-execute_workflow = Workflow().execute_workflow
\ No newline at end of file
+def execute_workflow(user_input: str):
+    """Run execute_workflow on the default workflow, for backward compatibility."""
+    return get_workflow().execute_workflow(user_input)